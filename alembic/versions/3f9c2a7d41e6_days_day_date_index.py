@@ -0,0 +1,73 @@
+"""Add normalized days.day_date with (group_id, day_date) index
+
+Revision ID: 3f9c2a7d41e6
+Revises: b54228d0028c
+Create Date: 2026-10-18 10:12:41.318207
+
+"""
+from typing import Sequence, Union
+import re
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a7d41e6'
+down_revision: Union[str, None] = 'b54228d0028c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_DMY_RE = re.compile(r"(\d{2})\.(\d{2})\.(\d{4})")
+_ISO_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+
+
+def _parse(value) -> date | None:
+    # Копия app.core.parsing.parse_day_date: миграция не должна зависеть от кода приложения
+    if value is None:
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        match = _DMY_RE.search(str(value))
+        if match:
+            dd, mm, yyyy = match.groups()
+            return date(int(yyyy), int(mm), int(dd))
+        match = _ISO_RE.search(str(value))
+        if match:
+            yyyy, mm, dd = match.groups()
+            return date(int(yyyy), int(mm), int(dd))
+    except ValueError:
+        return None
+    return None
+
+
+def upgrade() -> None:
+    op.add_column('days', sa.Column('day_date', sa.Date(), nullable=True))
+
+    # Переносим текстовые даты "ДД.ММ.ГГГГ" в нормальную колонку
+    bind = op.get_bind()
+    days = sa.table('days', sa.column('id', sa.Integer), sa.column('date', sa.String), sa.column('day_date', sa.Date))
+    rows = bind.execute(sa.select(days.c.id, days.c.date)).fetchall()
+    updates = [
+        {"_id": row[0], "day_date": parsed}
+        for row in rows
+        if (parsed := _parse(row[1])) is not None
+    ]
+    if updates:
+        bind.execute(
+            days.update().where(days.c.id == sa.bindparam('_id')).values(day_date=sa.bindparam('day_date')),
+            updates,
+        )
+
+    op.create_index('ix_days_group_id_day_date', 'days', ['group_id', 'day_date'], unique=False)
+    op.create_index('ix_days_day_date', 'days', ['day_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_days_day_date', table_name='days')
+    op.drop_index('ix_days_group_id_day_date', table_name='days')
+    # SQLite до 3.35 не умеет DROP COLUMN: batch пересоздаёт таблицу
+    with op.batch_alter_table('days') as batch_op:
+        batch_op.drop_column('day_date')
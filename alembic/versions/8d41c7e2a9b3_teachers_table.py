@@ -0,0 +1,92 @@
+"""Add teachers dimension table and lessons.teacher_id
+
+Revision ID: 8d41c7e2a9b3
+Revises: 3f9c2a7d41e6
+Create Date: 2026-10-18 12:40:07.552918
+
+"""
+from typing import Sequence, Union
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41c7e2a9b3'
+down_revision: Union[str, None] = '3f9c2a7d41e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_SPACES_RE = re.compile(r"\s+")
+_INITIALS_RE = re.compile(r"\.\s+(?=\w\.)")
+
+
+def _clean(value) -> str | None:
+    # Копия app.core.parsing.clean_teacher_name / canonical_teacher_name
+    if value is None:
+        return None
+    cleaned = _INITIALS_RE.sub(".", _SPACES_RE.sub(" ", str(value)).strip())
+    return cleaned or None
+
+
+def _canonical(value) -> str | None:
+    cleaned = _clean(value)
+    if cleaned is None:
+        return None
+    return cleaned.casefold().replace("ё", "е")
+
+
+def upgrade() -> None:
+    op.create_table(
+        'teachers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('canonical_name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_teachers_id'), 'teachers', ['id'], unique=False)
+    op.create_index(op.f('ix_teachers_canonical_name'), 'teachers', ['canonical_name'], unique=True)
+
+    # SQLite не умеет ADD CONSTRAINT - batch пересоздаёт таблицу
+    with op.batch_alter_table('lessons') as batch_op:
+        batch_op.add_column(sa.Column('teacher_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_lessons_teacher_id_teachers', 'teachers', ['teacher_id'], ['id'])
+
+    # Заполняем справочник из уникальных написаний ФИО и проставляем teacher_id
+    bind = op.get_bind()
+    lessons = sa.table('lessons', sa.column('teacher', sa.String), sa.column('teacher_id', sa.Integer))
+    teachers = sa.table(
+        'teachers', sa.column('id', sa.Integer), sa.column('name', sa.String), sa.column('canonical_name', sa.String)
+    )
+    spellings = [row[0] for row in bind.execute(sa.select(lessons.c.teacher).distinct()).fetchall()]
+    names = {}
+    for spelling in sorted(s for s in spellings if s is not None):
+        canonical = _canonical(spelling)
+        if canonical is not None and canonical not in names:
+            names[canonical] = _clean(spelling)
+    if names:
+        bind.execute(teachers.insert(), [{"name": name, "canonical_name": key} for key, name in names.items()])
+    ids = {row[1]: row[0] for row in bind.execute(sa.select(teachers.c.id, teachers.c.canonical_name))}
+    updates = [
+        {"_teacher": spelling, "teacher_id": ids[_canonical(spelling)]}
+        for spelling in spellings
+        if _canonical(spelling) in ids
+    ]
+    if updates:
+        bind.execute(
+            lessons.update().where(lessons.c.teacher == sa.bindparam('_teacher')).values(teacher_id=sa.bindparam('teacher_id')),
+            updates,
+        )
+
+    op.create_index(op.f('ix_lessons_teacher_id'), 'lessons', ['teacher_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_lessons_teacher_id'), table_name='lessons')
+    with op.batch_alter_table('lessons') as batch_op:
+        batch_op.drop_constraint('fk_lessons_teacher_id_teachers', type_='foreignkey')
+        batch_op.drop_column('teacher_id')
+    op.drop_index(op.f('ix_teachers_canonical_name'), table_name='teachers')
+    op.drop_index(op.f('ix_teachers_id'), table_name='teachers')
+    op.drop_table('teachers')
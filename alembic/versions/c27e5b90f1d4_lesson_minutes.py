@@ -0,0 +1,64 @@
+"""Add lessons.start_minute/end_minute with (day_id, start_minute) index
+
+Revision ID: c27e5b90f1d4
+Revises: 8d41c7e2a9b3
+Create Date: 2026-10-18 14:05:19.730554
+
+"""
+from typing import Sequence, Union
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c27e5b90f1d4'
+down_revision: Union[str, None] = '8d41c7e2a9b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_TIME_RE = re.compile(r"(\d{1,2})[:.](\d{2})")
+
+
+def _parse(value) -> tuple[int | None, int | None]:
+    # Копия app.core.parsing.parse_lesson_time
+    minutes = []
+    for hh, mm in _TIME_RE.findall(str(value or "")):
+        if int(hh) < 24 and int(mm) < 60:
+            minutes.append(int(hh) * 60 + int(mm))
+    start = minutes[0] if minutes else None
+    end = minutes[1] if len(minutes) > 1 else None
+    return start, end
+
+
+def upgrade() -> None:
+    op.add_column('lessons', sa.Column('start_minute', sa.Integer(), nullable=True))
+    op.add_column('lessons', sa.Column('end_minute', sa.Integer(), nullable=True))
+
+    # Разбираем строки вида "13:35 - 15:10"; различных значений time немного, обновляем по ним
+    bind = op.get_bind()
+    lessons = sa.table(
+        'lessons', sa.column('time', sa.String), sa.column('start_minute', sa.Integer), sa.column('end_minute', sa.Integer)
+    )
+    updates = []
+    for row in bind.execute(sa.select(lessons.c.time).distinct()).fetchall():
+        start, end = _parse(row[0])
+        if start is not None and row[0] is not None:
+            updates.append({"_time": row[0], "start_minute": start, "end_minute": end})
+    if updates:
+        bind.execute(
+            lessons.update().where(lessons.c.time == sa.bindparam('_time')).values(
+                start_minute=sa.bindparam('start_minute'), end_minute=sa.bindparam('end_minute')
+            ),
+            updates,
+        )
+
+    op.create_index('ix_lessons_day_id_start_minute', 'lessons', ['day_id', 'start_minute'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_lessons_day_id_start_minute', table_name='lessons')
+    with op.batch_alter_table('lessons') as batch_op:
+        batch_op.drop_column('end_minute')
+        batch_op.drop_column('start_minute')
@@ -0,0 +1,28 @@
+"""Add days.fingerprint for incremental imports
+
+Revision ID: e6a1f3c8b7d2
+Revises: c27e5b90f1d4
+Create Date: 2026-10-18 16:22:48.104937
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a1f3c8b7d2'
+down_revision: Union[str, None] = 'c27e5b90f1d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Без backfill: у старых дней отпечатка нет, первый инкрементальный импорт перезапишет их один раз
+    op.add_column('days', sa.Column('fingerprint', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('days') as batch_op:
+        batch_op.drop_column('fingerprint')
@@ -0,0 +1,529 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+
+import orjson
+
+import redis.asyncio as aioredis
+
+from .config import settings
+from .parsing import canonical_teacher_name
+from .metrics import add_timing, timed, mark_cache
+
+logger = logging.getLogger("app")
+
+# --- Redis подключение (L2) ---
+# Асинхронный клиент с пулом: соединения создаются лениво, недоступный при старте Redis подхватится позже
+redis_client = aioredis.Redis(
+    connection_pool=aioredis.ConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        password=settings.REDIS_PASSWORD,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT
+    )
+) if settings.REDIS_HOST else None
+
+
+class CircuitBreaker:
+    """После N ошибок подряд перестаём ходить в Redis; обратно включает health-probe или пробный запрос по таймауту"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trips = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        # half-open: раз в reset_timeout пропускаем один пробный запрос
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("✅ Redis снова доступен, кеш включён")
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.opened_at is None and self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self.trips += 1
+            logger.warning(f"⚠️ Redis: {self.failures} ошибок подряд, работаем без L2-кеша")
+        elif self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+
+redis_breaker = CircuitBreaker(settings.REDIS_FAILURE_THRESHOLD, settings.REDIS_RESET_TIMEOUT)
+
+
+def redis_available() -> bool:
+    return redis_client is not None and redis_breaker.allow()
+
+
+async def redis_call(method: str, *args, **kwargs):
+    """Вызов Redis через circuit breaker; ошибки считаются и пробрасываются"""
+    started = time.perf_counter()
+    try:
+        result = await getattr(redis_client, method)(*args, **kwargs)
+    except Exception:
+        redis_breaker.record_failure()
+        raise
+    finally:
+        add_timing("cache", time.perf_counter() - started)
+    redis_breaker.record_success()
+    return result
+
+
+async def redis_health_probe():
+    """Фоновая проверка Redis: при открытом breaker пингуем и включаем кеш обратно"""
+    while True:
+        if redis_breaker.is_open:
+            try:
+                await redis_client.ping()
+                redis_breaker.record_success()
+            except Exception as e:
+                logger.debug(f"Redis health probe failed: {e}")
+        await asyncio.sleep(settings.REDIS_HEALTH_INTERVAL)
+
+
+_health_task: asyncio.Task | None = None
+
+
+async def start_cache():
+    """Стартовая проверка Redis и запуск health-probe (вызывается при старте приложения)"""
+    global _health_task
+    if redis_client is None:
+        logger.warning("⚠️ REDIS_HOST не задан. Работаем без L2-кеша")
+        return
+    try:
+        await redis_call("ping")
+        logger.info("✅ Redis подключен успешно")
+    except Exception as e:
+        # Не ждём threshold: сразу открываем breaker, дальше Redis вернёт health-probe
+        redis_breaker.failures = redis_breaker.failure_threshold - 1
+        redis_breaker.record_failure()
+        logger.warning(f"⚠️ Redis недоступен: {e}. Работаем без кеша до восстановления")
+    _health_task = asyncio.create_task(redis_health_probe())
+
+
+async def stop_cache():
+    global _health_task
+    if _health_task is not None:
+        _health_task.cancel()
+        _health_task = None
+    if redis_client is not None:
+        try:
+            await redis_client.aclose()
+        except Exception:
+            pass
+
+
+class LocalCache:
+    """LRU-кеш внутри процесса (L1): ограничен по числу записей, записи истекают по TTL"""
+
+    def __init__(self, max_items: int, ttl: int):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    def get(self, key: str) -> bytes | None:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bytes, ttl: int | None = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._items[key] = (time.monotonic() + ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def delete(self, key: str):
+        self._items.pop(key, None)
+
+    def clear(self):
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+local_cache = LocalCache(settings.CACHE_L1_MAX_ITEMS, settings.CACHE_L1_TTL)
+
+# Попадания/промахи по уровням кеша (для /admin/stats)
+cache_stats = {
+    "l1": {"hits": 0, "misses": 0},
+    "l2": {"hits": 0, "misses": 0, "errors": 0},
+    "singleflight": {"loads": 0, "coalesced": 0, "lock_waits": 0, "lock_hits": 0},
+}
+
+# Загрузки, идущие прямо сейчас: ключ -> задача загрузки
+_inflight: dict[str, asyncio.Task] = {}
+
+
+def get_cache_key(prefix: str, *args) -> str:
+    """Генерация ключа для кеша"""
+    return f"{prefix}:" + ":".join(str(arg) for arg in args)
+
+
+def serialize_payload(data) -> bytes:
+    """Итоговые UTF-8 байты ответа (orjson); date/datetime сериализуются в ISO"""
+    with timed("serialize"):
+        return orjson.dumps(data, default=str)
+
+
+async def get_cached_bytes(cache_key: str, l2: bool = True) -> bytes | None:
+    """Готовые байты ответа: сначала L1 в процессе, потом Redis (с подъёмом в L1); l2=False - только L1"""
+    payload = local_cache.get(cache_key)
+    if payload is not None:
+        cache_stats["l1"]["hits"] += 1
+        mark_cache("hit")
+        return payload
+    cache_stats["l1"]["misses"] += 1
+
+    if not l2 or not redis_available():
+        mark_cache("miss")
+        return None
+    try:
+        payload = await redis_call("get", cache_key)
+    except Exception as e:
+        cache_stats["l2"]["errors"] += 1
+        logger.warning(f"❌ Ошибка чтения кеша {cache_key}: {e}")
+        mark_cache("miss")
+        return None
+    if payload is None:
+        cache_stats["l2"]["misses"] += 1
+        mark_cache("miss")
+        return None
+    cache_stats["l2"]["hits"] += 1
+    mark_cache("hit")
+    local_cache.set(cache_key, payload)
+    return payload
+
+
+async def get_from_cache(cache_key: str, l2: bool = True):
+    """Безопасное получение из кеша"""
+    payload = await get_cached_bytes(cache_key, l2)
+    if payload is None:
+        return None
+    try:
+        return orjson.loads(payload)
+    except Exception as e:
+        logger.warning(f"❌ Ошибка чтения кеша {cache_key}: {e}")
+        return None
+
+
+async def set_to_cache(cache_key: str, data, ttl: int, l2: bool = True):
+    """Безопасное сохранение в кеш (оба уровня; l2=False - только L1)"""
+    await set_bytes_to_cache(cache_key, serialize_payload(data), ttl, l2)
+
+
+async def set_bytes_to_cache(cache_key: str, payload: bytes, ttl: int, l2: bool = True):
+    local_cache.set(cache_key, payload, ttl)
+    if not l2 or not redis_available():
+        return
+    try:
+        await redis_call("setex", cache_key, ttl, payload)
+        logger.info(f"💾 Кеш сохранён: {cache_key} (TTL: {ttl}s)")
+    except Exception as e:
+        cache_stats["l2"]["errors"] += 1
+        logger.warning(f"❌ Ошибка записи кеша {cache_key}: {e}")
+
+
+def _forget_inflight(key: str, task: asyncio.Task):
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    if not task.cancelled():
+        task.exception()  # помечаем как полученное, если ждущих не было
+
+
+async def singleflight(key: str, loader):
+    """Одна загрузка на ключ в процессе: конкурентные вызовы ждут результат первого.
+    Загрузка идёт отдельной задачей: отмена одного из ждущих (клиент отключился) не отменяет её для остальных"""
+    task = _inflight.get(key)
+    if task is not None:
+        cache_stats["singleflight"]["coalesced"] += 1
+    else:
+        task = asyncio.create_task(loader())
+        _inflight[key] = task
+        cache_stats["singleflight"]["loads"] += 1
+        task.add_done_callback(lambda done: _forget_inflight(key, done))
+    return await asyncio.shield(task)
+
+
+async def _lock_released(lock_key: str) -> bool:
+    try:
+        return not await redis_call("exists", lock_key)
+    except Exception:
+        return True  # Redis сбоит - не ждём, грузим сами
+
+
+async def _load_with_redis_lock(cache_key: str, loader, ttl: int):
+    """Межпроцессная коалесценция: загружает только владелец lock-ключа, остальные ждут его запись в кеш"""
+    lock_key = f"lock:{cache_key}"
+    token = uuid.uuid4().hex
+    try:
+        acquired = await redis_call("set", lock_key, token, nx=True, px=settings.CACHE_LOCK_TIMEOUT_MS)
+    except Exception as e:
+        # Redis нездоров - ждать чужую загрузку бессмысленно, грузим сразу
+        logger.warning(f"❌ Ошибка блокировки {lock_key}: {e}")
+        return await _load_and_store(cache_key, loader, ttl)
+
+    if acquired:
+        try:
+            return await _load_and_store(cache_key, loader, ttl)
+        finally:
+            try:
+                if await redis_call("get", lock_key) == token.encode():
+                    await redis_call("delete", lock_key)
+            except Exception:
+                pass
+
+    # Другой воркер уже грузит этот ключ - ждём его результат в кеше
+    cache_stats["singleflight"]["lock_waits"] += 1
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT_MS / 1000
+    while time.monotonic() < deadline:
+        await asyncio.sleep(settings.CACHE_LOCK_POLL_MS / 1000)
+        cached = await get_cached_bytes(cache_key)
+        if cached is not None:
+            cache_stats["singleflight"]["lock_hits"] += 1
+            return cached
+        # Владелец снял блокировку, ничего не записав (загрузчик вернул None или упал) - дальше не ждём
+        if await _lock_released(lock_key):
+            break
+    return await _load_and_store(cache_key, loader, ttl)
+
+
+async def _load_and_store(cache_key: str, loader, ttl: int, l2: bool = True) -> bytes | None:
+    data = await loader()
+    if data is None:
+        return None
+    payload = serialize_payload(data)
+    await set_bytes_to_cache(cache_key, payload, ttl, l2)
+    return payload
+
+
+async def get_or_load(cache_key: str, loader, ttl: int, l2: bool = True) -> bytes | None:
+    """Готовые байты ответа из кеша, а при промахе - одна загрузка на ключ (None не кешируется).
+    l2=False (версия неизвестна) - запись живёт только в L1 и не переживёт восстановление Redis"""
+    cached = await get_cached_bytes(cache_key, l2)
+    if cached is not None:
+        return cached
+
+    async def load():
+        if l2 and settings.CACHE_REDIS_LOCK and redis_available():
+            return await _load_with_redis_lock(cache_key, loader, ttl)
+        return await _load_and_store(cache_key, loader, ttl, l2)
+
+    return await singleflight(cache_key, load)
+
+
+# --- Версии расписаний ---
+# Redis-хеш со счётчиками поколений: "global" (полная перезаливка), "group:{id}", "teacher:{name}".
+# Версия входит в ключ кеша, поэтому после импорта старые записи просто перестают читаться
+# и вытесняются по LRU, а новые можно хранить без привязки ко времени суток.
+VERSIONS_KEY = "schedule_versions"
+# Счётчик импортов в том же хеше: по нему фоновые задачи узнают, что данные обновились
+IMPORTS_FIELD = "imports"
+
+# Версия, когда Redis недоступен: ключи с ней живут только в L1, ETag по ней не выдаются
+UNKNOWN_VERSION = "u"
+
+version_cache = LocalCache(max_items=10000, ttl=settings.CACHE_VERSION_TTL)
+
+
+def group_scope(group_id) -> str:
+    return f"group:{group_id}"
+
+
+def teacher_scope(teacher_name: str) -> str:
+    # Варианты написания ФИО делят одну версию
+    return f"teacher:{canonical_teacher_name(teacher_name) or teacher_name}"
+
+
+async def get_schedule_version(scope: str) -> str:
+    """Версия вида "<global>.<scope>"; в процессе кешируется на CACHE_VERSION_TTL секунд.
+    scope=IMPORTS_FIELD даёт версию, меняющуюся при любом импорте (для списков групп/преподавателей)"""
+    cached = version_cache.get(scope)
+    if cached is not None:
+        return cached
+    if not redis_available():
+        return UNKNOWN_VERSION
+    try:
+        global_version, scope_version = await redis_call("hmget", VERSIONS_KEY, "global", scope)
+    except Exception as e:
+        logger.warning(f"❌ Ошибка чтения версии {scope}: {e}")
+        return UNKNOWN_VERSION
+    version = f"{int(global_version or 0)}.{int(scope_version or 0)}"
+    version_cache.set(scope, version)
+    return version
+
+
+async def bump_schedule_versions(groups=(), teachers=(), everything: bool = False) -> bool:
+    """Инвалидация после импорта: увеличиваем версии затронутых групп и преподавателей"""
+    fields = ["global"] if everything else []
+    fields += [group_scope(group_id) for group_id in groups]
+    fields += [teacher_scope(name) for name in teachers if name]
+    if not fields:
+        return True
+    fields.append(IMPORTS_FIELD)
+    version_cache.clear()
+    if redis_client is None:
+        logger.warning("⚠️ Redis не настроен, версии расписаний не обновлены")
+        return False
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for field in fields:
+                pipe.hincrby(VERSIONS_KEY, field, 1)
+            await pipe.execute()
+    except Exception as e:
+        logger.error(f"❌ Не удалось обновить версии расписаний ({len(fields)} шт.): {e}")
+        return False
+    logger.info(f"🔄 Версии расписаний обновлены: {len(fields)} шт.")
+    return True
+
+
+async def get_import_generation() -> int | None:
+    """Сколько раз импорты обновляли версии (None, если Redis недоступен)"""
+    if not redis_available():
+        return None
+    try:
+        value = await redis_call("hget", VERSIONS_KEY, IMPORTS_FIELD)
+    except Exception:
+        return None
+    return int(value or 0)
+
+
+def get_cache_stats() -> dict:
+    return {
+        "l1": {**cache_stats["l1"], "size": len(local_cache), "max_items": local_cache.max_items},
+        "l2": {
+            **cache_stats["l2"],
+            "breaker": "open" if redis_breaker.is_open else "closed",
+            "breaker_trips": redis_breaker.trips,
+        },
+        "singleflight": {**cache_stats["singleflight"], "inflight": len(_inflight)},
+    }
+
+
+# --- Интроспекция Redis для /admin/stats ---
+# Никаких KEYS: общее число ключей берём из INFO keyspace, разбивку по префиксам
+# (group_schedule:, teacher_schedule:, ...) - по выборке инкрементального SCAN с бюджетом
+# CACHE_STATS_SAMPLE ключей, память - MEMORY USAGE по ключам выборки. Результат живёт
+# CACHE_STATS_TTL секунд, так что частые запросы статистики не нагружают Redis.
+SCAN_BATCH = 200
+
+redis_stats_cache = LocalCache(max_items=1, ttl=settings.CACHE_STATS_TTL)
+# Свой замок, а не singleflight: опрос /admin/stats не должен попадать в счётчики singleflight кеша
+_redis_stats_lock = asyncio.Lock()
+
+
+def parse_keyspace(info: dict) -> dict:
+    """INFO keyspace -> {"db0": {"keys": N, "expires": M}}; redis-py уже разбирает значения в словари"""
+    keyspace = {}
+    for db, value in info.items():
+        if isinstance(value, dict):
+            keyspace[db] = {"keys": int(value.get("keys", 0)), "expires": int(value.get("expires", 0))}
+    return keyspace
+
+
+def key_prefix(key: bytes | str) -> str:
+    if isinstance(key, bytes):
+        key = key.decode(errors="replace")
+    return key.split(":", 1)[0]
+
+
+async def scan_sample(budget: int) -> tuple[dict, list, bool]:
+    """(префикс -> {"keys", "memory_bytes"}, первые ключи, пройдена ли вся база) по SCAN-выборке"""
+    prefixes: dict[str, dict] = {}
+    sample_keys: list[str] = []
+    seen = 0
+    cursor = 0
+    while True:
+        cursor, keys = await redis_call("scan", cursor=cursor, count=SCAN_BATCH)
+        keys = keys[:budget - seen]
+        if keys:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.memory_usage(key)
+                # MEMORY USAGE бывает запрещена (managed Redis) - тогда считаем только ключи
+                sizes = await pipe.execute(raise_on_error=False)
+            for key, size in zip(keys, sizes):
+                prefix = prefixes.setdefault(key_prefix(key), {"keys": 0, "memory_bytes": 0})
+                prefix["keys"] += 1
+                prefix["memory_bytes"] += size if isinstance(size, int) else 0
+            if len(sample_keys) < 10:
+                sample_keys.extend(k.decode(errors="replace") for k in keys[:10 - len(sample_keys)])
+            seen += len(keys)
+        if cursor == 0:
+            return prefixes, sample_keys, True
+        if seen >= budget:
+            return prefixes, sample_keys, False
+
+
+async def collect_redis_stats() -> dict:
+    keyspace = parse_keyspace(await redis_call("info", "keyspace"))
+    memory = await redis_call("info", "memory")
+    prefixes, sample_keys, complete = await scan_sample(settings.CACHE_STATS_SAMPLE)
+
+    total_keys = keyspace.get(f"db{settings.REDIS_DB}", {}).get("keys", 0)
+    sampled = sum(p["keys"] for p in prefixes.values())
+    # Неполная выборка: оцениваем префиксы пропорционально доле в выборке
+    scale = 1 if complete or not sampled else total_keys / sampled
+    by_prefix = {
+        name: {
+            "keys": round(stats["keys"] * scale),
+            "memory_bytes": round(stats["memory_bytes"] * scale),
+        }
+        for name, stats in sorted(prefixes.items(), key=lambda item: item[1]["memory_bytes"], reverse=True)
+    }
+    return {
+        "status": "connected",
+        "keys_count": total_keys,
+        "keyspace": keyspace,
+        "memory_usage": memory.get("used_memory_human", "N/A"),
+        "sampled_keys": sampled,
+        "estimated": not complete,
+        "by_prefix": by_prefix,
+        "sample_keys": sample_keys,
+    }
+
+
+async def get_redis_stats() -> dict:
+    """Статистика Redis для /admin/stats, не чаще раза в CACHE_STATS_TTL секунд на воркер"""
+    cached = redis_stats_cache.get("redis")
+    if cached is not None:
+        return cached
+    if not redis_available():
+        return {"status": "disabled", "keys_count": 0, "memory_usage": "N/A"}
+    async with _redis_stats_lock:
+        cached = redis_stats_cache.get("redis")  # пока ждали замок, статистику уже собрал другой запрос
+        if cached is not None:
+            return cached
+        try:
+            stats = await collect_redis_stats()
+        except Exception as e:
+            return {"status": "error", "error": str(e)}
+        redis_stats_cache.set("redis", stats)
+    return stats
@@ -9,9 +9,46 @@ class Settings(BaseSettings):
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
     REDIS_PASSWORD: str | None = None
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 0.25  # Сек; медленный Redis не должен тормозить ответы
+    REDIS_FAILURE_THRESHOLD: int = 3  # Ошибок подряд до отключения Redis (circuit breaker)
+    REDIS_RESET_TIMEOUT: float = 30  # Сек до пробного запроса при открытом breaker
+    REDIS_HEALTH_INTERVAL: float = 5  # Сек между health-probe при открытом breaker
+    CACHE_L1_MAX_ITEMS: int = 2048  # Записей в L1-кеше внутри процесса
+    CACHE_L1_TTL: int = 300  # Максимальный срок жизни записи в L1, сек
+    CACHE_VERSION_TTL: int = 5  # Сек, сколько процесс доверяет прочитанной версии расписания
+    SCHEDULE_CACHE_TTL: int = 7 * 24 * 3600  # Записи версионированы, TTL только для уборки
+    CACHE_REDIS_LOCK: bool = False  # Коалесцировать промахи кеша между воркерами через Redis-lock
+    CACHE_LOCK_TIMEOUT_MS: int = 5000  # Время жизни lock-ключа и максимум ожидания чужой загрузки
+    CACHE_LOCK_POLL_MS: int = 50  # Интервал опроса кеша при ожидании чужой загрузки
+    CACHE_STATS_TTL: int = 10  # Сек, сколько /admin/stats переиспользует собранную статистику Redis
+    CACHE_STATS_SAMPLE: int = 1000  # Максимум ключей, просматриваемых SCAN-ом для разбивки по префиксам
+    HTTP_CACHE_MAX_AGE: int = 60  # Cache-Control max-age для расписаний; потом клиент ревалидирует по ETag
+    DB_POOL_SIZE: int = 5  # Соединений в пуле на воркер (не SQLite)
+    DB_MAX_OVERFLOW: int = 10  # Сверх пула при пиках
+    DB_POOL_TIMEOUT: float = 10  # Сек ожидания свободного соединения
+    DB_POOL_RECYCLE: int = 1800  # Сек, после которых соединение переоткрывается (MySQL закрывает простаивающие)
+    DB_POOL_PRE_PING: bool = True  # Проверять соединение перед выдачей из пула
+    SLOW_QUERY_MS: float = 100  # SQL-запросы дольше порога пишутся в лог
+    METRICS_REDIS_KEY: str = "metrics"  # Redis-хеш с метриками всех воркеров (для /metrics)
+    METRICS_FLUSH_INTERVAL: float = 5  # Сек между сбросом накопленных приращений метрик в Redis
+    SQLITE_WAL: bool = True  # WAL: чтение не блокируется записью импорта
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # В WAL безопасно для целостности, fsync только на checkpoint
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # Байт файла БД, читаемых через mmap
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024  # Страничный кеш на соединение
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # Ожидание блокировки вместо мгновенного "database is locked"
     DOMAIN: str
     SUBDOMAIN_ENABLED: bool = True
+    WARMUP_ENABLED: bool = True  # Фоновый прогрев кеша популярных групп/преподавателей
+    WARMUP_TOP_N: int = 20  # Сколько групп и преподавателей прогревать
+    WARMUP_TIME: str = "02:00"  # Ежедневный прогрев (время в TIMEZONE расписания), ЧЧ:ММ
+    WARMUP_POLL_INTERVAL: int = 60  # Сек между проверками, не было ли импорта
+    TIMEZONE: str | None = None  # Часовой пояс расписания для /now, например Europe/Moscow (по умолчанию - время сервера)
     ALLOW_PUBLIC: bool = False  # Позволять доступ без Telegram InitData (для отладки/демо)
+    AUTH_CACHE_TTL: int = 300  # Сек, сколько помним результат проверки initData
+    AUTH_CACHE_MAX_ITEMS: int = 10000  # Проверенных initData в кеше процесса
+    USER_FLUSH_INTERVAL: float = 5  # Сек между сбросом отложенных обновлений пользователей в БД
+    USER_FLUSH_MAX_USERS: int = 500  # Сбрасывать раньше, если накопилось столько пользователей
 
     class Config:
         env_file = ".env"
@@ -1,17 +1,155 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from ..core.config import settings
+from ..core.metrics import install_sql_hooks, request_timings
 
 Base = declarative_base()
 
+# Синхронные драйверы -> их async-аналоги для AsyncEngine
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+}
+
+def get_async_database_url(url: str) -> str:
+    """sqlite:///./schedule.db -> sqlite+aiosqlite:///./schedule.db (async-URL оставляем как есть)"""
+    scheme, sep, rest = url.partition("://")
+    if not sep:
+        return url
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def _sqlite_pragmas() -> list[str]:
+    pragmas = [
+        f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE}",
+        # Отрицательное значение - размер в КиБ, а не в страницах
+        f"PRAGMA cache_size = -{settings.SQLITE_CACHE_SIZE_KB}",
+        "PRAGMA temp_store = MEMORY",
+    ]
+    if settings.SQLITE_WAL:
+        # WAL: читатели работают со снимком и не ждут пишущий импорт (и наоборот)
+        pragmas.insert(0, "PRAGMA journal_mode = WAL")
+    return pragmas
+
+def _install_sqlite_pragmas(sync_engine: Engine):
+    pragmas = _sqlite_pragmas()
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+def _engine_options(url: str) -> dict:
+    if _is_sqlite(url):
+        # У SQLite пул - это файловые дескрипторы; размеры пула/recycle не нужны
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+# Сессии и соединения: сколько раз брали соединение из пула и сколько запросов обошлись
+# без единого checkout (ответ из кеша) - последнее считает track_performance по RequestTimings.checkouts
+db_stats = {"sessions_opened": 0, "checkouts": 0, "requests_with_checkout": 0, "requests_without_checkout": 0}
+
+def _count_checkouts(sync_engine: Engine):
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        db_stats["checkouts"] += 1
+        timings = request_timings.get()
+        if timings is not None:
+            timings.checkouts += 1
+
+def create_db_engine(url: str, **kwargs) -> Engine:
+    """Синхронный движок с настройками из Settings (PRAGMA для SQLite, пул для остальных)"""
+    db_engine = create_engine(url, **{**_engine_options(url), **kwargs})
+    if _is_sqlite(url):
+        _install_sqlite_pragmas(db_engine)
+    install_sql_hooks(db_engine)
+    _count_checkouts(db_engine)
+    return db_engine
+
+def create_async_db_engine(url: str, **kwargs):
+    """Async-вариант create_db_engine: URL переводится на async-драйвер"""
+    async_url = get_async_database_url(url)
+    try:
+        db_engine = create_async_engine(async_url, **{**_engine_options(async_url), **kwargs})
+    except ModuleNotFoundError as e:
+        # Без этого приложение падает на импорте с голым "No module named ..." без указания причины
+        raise RuntimeError(
+            f"Для DATABASE_URL={make_url(url).render_as_string(hide_password=True)} нужен async-драйвер "
+            f"{make_url(async_url).drivername}: установите пакет {e.name} (pip install -r requirements.txt)"
+        ) from e
+    if _is_sqlite(async_url):
+        _install_sqlite_pragmas(db_engine.sync_engine)
+    install_sql_hooks(db_engine.sync_engine)
+    _count_checkouts(db_engine.sync_engine)
+    return db_engine
+
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async-движок для обработчиков FastAPI: запросы не блокируют event loop
+async_engine = create_async_db_engine(SQLALCHEMY_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+class LazySession:
+    """Сессия, создаваемая при первом обращении: обработчик, ответивший из кеша,
+    не создаёт сессию и не берёт соединение из пула"""
+
+    __slots__ = ("_factory", "_session")
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._session = None
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    def _get(self):
+        if self._session is None:
+            self._session = self._factory()
+            db_stats["sessions_opened"] += 1
+        return self._session
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
 def get_db():
-    db = SessionLocal()
+    db = LazySession(SessionLocal)
+    try:
+        yield db
+    finally:
+        if db.opened:
+            db.close()
+
+async def get_async_db():
+    db = LazySession(AsyncSessionLocal)
     try:
         yield db
     finally:
-        db.close()
+        if db.opened:
+            await db.close()
+
+def get_db_stats() -> dict:
+    return {**db_stats, "pool": async_engine.pool.status()}
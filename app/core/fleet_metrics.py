@@ -0,0 +1,156 @@
+import asyncio
+import logging
+from bisect import bisect_left
+
+from .config import settings
+from .cache import redis_client, redis_available, redis_breaker, redis_call
+
+logger = logging.getLogger("app")
+
+# Метрики всех воркеров uvicorn: каждый процесс копит приращения у себя (запись - пара
+# операций со словарём) и раз в METRICS_FLUSH_INTERVAL сбрасывает их одной транзакцией
+# HINCRBY/HINCRBYFLOAT в общий Redis-хеш. /metrics читает хеш и отдаёт текст в формате Prometheus.
+# Без Redis /metrics показывает только свой воркер.
+
+PREFIX = "schedule_api"
+
+# Границы корзин гистограммы времени ответа (сек), как принято в Prometheus-клиентах
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# имя -> (тип, описание, метки)
+METRICS = {
+    "requests_total": ("counter", "Обработанные запросы", ("endpoint",)),
+    "errors_total": ("counter", "Запросы, завершившиеся исключением", ("endpoint",)),
+    "cache_requests_total": ("counter", "Запросы по исходу кеша (hit/miss/not_modified/none)", ("endpoint", "cache")),
+    "db_queries_total": ("counter", "SQL-запросы", ("endpoint",)),
+    "db_seconds_total": ("counter", "Время в SQL-запросах, сек", ("endpoint",)),
+    "request_duration_seconds": ("histogram", "Время ответа, сек", ("endpoint",)),
+}
+
+# Разделитель частей поля хеша: metric|endpoint|extra (имена эндпоинтов - имена функций)
+SEPARATOR = "|"
+
+
+def _field(*parts) -> str:
+    return SEPARATOR.join(str(part) for part in parts)
+
+
+class FleetMetrics:
+    def __init__(self):
+        self.pending: dict[str, float] = {}  # Приращения с последнего сброса
+        self.totals: dict[str, float] = {}  # Всё, что записал этот процесс (когда Redis нет)
+
+    def _inc(self, field: str, value: float = 1):
+        self.pending[field] = self.pending.get(field, 0) + value
+        self.totals[field] = self.totals.get(field, 0) + value
+
+    def record_request(self, endpoint: str, seconds: float, cache_status: str = "none",
+                       db_queries: int = 0, db_seconds: float = 0.0, error: bool = False):
+        self._inc(_field("requests_total", endpoint))
+        if error:
+            self._inc(_field("errors_total", endpoint))
+        self._inc(_field("cache_requests_total", endpoint, cache_status))
+        if db_queries:
+            self._inc(_field("db_queries_total", endpoint), db_queries)
+            self._inc(_field("db_seconds_total", endpoint), db_seconds)
+        bucket = bisect_left(LATENCY_BUCKETS, seconds)
+        le = LATENCY_BUCKETS[bucket] if bucket < len(LATENCY_BUCKETS) else "+Inf"
+        self._inc(_field("request_duration_seconds_bucket", endpoint, le))
+        self._inc(_field("request_duration_seconds_sum", endpoint), seconds)
+
+    async def flush(self) -> bool:
+        """Сбрасываем накопленные приращения в Redis; при ошибке возвращаем их обратно в pending.
+        Доставка "хотя бы один раз": если EXEC выполнился, а ответ потерялся (обрыв, таймаут),
+        повтор применит ту же пачку ещё раз и счётчики завысятся на одну пачку воркера"""
+        if not self.pending or not redis_available():
+            return False
+        batch, self.pending = self.pending, {}
+        try:
+            # MULTI/EXEC: пачка применяется целиком или никак - частично сброшенных счётчиков не бывает
+            async with redis_client.pipeline(transaction=True) as pipe:
+                for field, value in batch.items():
+                    if isinstance(value, float):
+                        pipe.hincrbyfloat(settings.METRICS_REDIS_KEY, field, value)
+                    else:
+                        pipe.hincrby(settings.METRICS_REDIS_KEY, field, value)
+                await pipe.execute()
+        except Exception as e:
+            redis_breaker.record_failure()
+            for field, value in batch.items():
+                self.pending[field] = self.pending.get(field, 0) + value
+            logger.warning(f"❌ Не удалось сбросить метрики в Redis ({len(batch)} полей): {e}")
+            return False
+        return True
+
+    async def collect(self) -> tuple[dict[str, float], str]:
+        """(значения, источник): весь парк из Redis плюс ещё не сброшенное этим воркером"""
+        if redis_available():
+            try:
+                raw = await redis_call("hgetall", settings.METRICS_REDIS_KEY)
+            except Exception as e:
+                logger.warning(f"❌ Ошибка чтения метрик из Redis: {e}")
+            else:
+                values = {field.decode(): float(value) for field, value in raw.items()}
+                for field, value in self.pending.items():
+                    values[field] = values.get(field, 0) + value
+                return values, "redis"
+        return dict(self.totals), "local"
+
+    def clear(self):
+        self.pending.clear()
+        self.totals.clear()
+
+
+fleet_metrics = FleetMetrics()
+
+
+def _labels(names, values) -> str:
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus(values: dict[str, float]) -> str:
+    """Текстовый формат экспозиции Prometheus 0.0.4"""
+    series: dict[str, dict[tuple, float]] = {}
+    for field, value in values.items():
+        name, *labels = field.split(SEPARATOR)
+        series.setdefault(name, {})[tuple(labels)] = value
+
+    lines = []
+    for name, (kind, help_text, label_names) in METRICS.items():
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+        if kind != "histogram":
+            for labels, value in sorted(series.get(name, {}).items()):
+                lines.append(f"{PREFIX}_{name}{_labels(label_names, labels)} {_number(value)}")
+            continue
+
+        buckets = {}
+        for (endpoint, le), count in series.get(f"{name}_bucket", {}).items():
+            buckets.setdefault(endpoint, {})[le] = count
+        sums = series.get(f"{name}_sum", {})
+        for endpoint in sorted(buckets):
+            cumulative = 0
+            for le in [*LATENCY_BUCKETS, "+Inf"]:
+                cumulative += buckets[endpoint].get(str(le), 0)
+                lines.append(f'{PREFIX}_{name}_bucket{{endpoint="{endpoint}",le="{le}"}} {_number(cumulative)}')
+            lines.append(f'{PREFIX}_{name}_sum{{endpoint="{endpoint}"}} {_number(sums.get((endpoint,), 0))}')
+            lines.append(f'{PREFIX}_{name}_count{{endpoint="{endpoint}"}} {_number(cumulative)}')
+    return "\n".join(lines) + "\n"
+
+
+def fleet_summary(values: dict[str, float]) -> dict:
+    """Итоги по всем воркерам для /admin/stats"""
+    requests = sum(v for f, v in values.items() if f.startswith("requests_total" + SEPARATOR))
+    errors = sum(v for f, v in values.items() if f.startswith("errors_total" + SEPARATOR))
+    return {"requests": int(requests), "errors": int(errors)}
+
+
+async def metrics_flush_loop():
+    while True:
+        await asyncio.sleep(settings.METRICS_FLUSH_INTERVAL)
+        await fleet_metrics.flush()
@@ -0,0 +1,190 @@
+import logging
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger("app")
+
+# Разбивка времени запроса по этапам (db, cache, auth, serialize). Объект живёт в contextvar:
+# middleware создаёт его на запрос, хуки SQLAlchemy и обёртки кеша/авторизации дописывают время,
+# в конце он уходит в заголовок Server-Timing и в агрегаты /admin/stats.
+
+TIMING_NAMES = ("db", "cache", "auth", "serialize")
+
+
+# Исход обращения к кешу за запрос: любой промах делает запрос "miss"
+CACHE_STATUSES = ("hit", "miss", "not_modified", "none")
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {name: 0.0 for name in TIMING_NAMES}
+        self.counts = {name: 0 for name in TIMING_NAMES}
+        self.cache_status = "none"
+        self.checkouts = 0  # Соединений, взятых из пула за запрос
+
+    def mark_cache(self, status: str):
+        if self.cache_status != "miss":
+            self.cache_status = status
+
+    def add(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing (миллисекунды)"""
+        parts = []
+        for name, seconds in self.durations.items():
+            if self.counts[name]:
+                desc = f';desc="{self.counts[name]} queries"' if name == "db" else ""
+                parts.append(f"{name};dur={seconds * 1000:.2f}{desc}")
+        parts.append(f"total;dur={self.total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+request_timings: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> RequestTimings:
+    timings = RequestTimings()
+    request_timings.set(timings)
+    return timings
+
+
+def add_timing(name: str, seconds: float):
+    timings = request_timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+def mark_cache(status: str):
+    timings = request_timings.get()
+    if timings is not None:
+        timings.mark_cache(status)
+
+
+@contextmanager
+def timed(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(name, time.perf_counter() - started)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек фиксированного размера с логарифмическими корзинами (как HDR):
+    запись - O(1) без аллокаций структур, относительная ошибка перцентилей ~GROWTH/2.
+    Диапазон MIN_SECONDS..MAX_SECONDS, значения за границами попадают в крайние корзины."""
+
+    MIN_SECONDS = 1e-5
+    MAX_SECONDS = 60.0
+    GROWTH = 0.04  # Ширина корзины: +4% к нижней границе
+
+    _log_growth = math.log1p(GROWTH)
+    BUCKETS = int(math.log(MAX_SECONDS / MIN_SECONDS) / _log_growth) + 1
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        if seconds <= self.MIN_SECONDS:
+            index = 0
+        else:
+            index = min(int(math.log(seconds / self.MIN_SECONDS) / self._log_growth), self.BUCKETS - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """Верхняя граница корзины, в которую попал q-й перцентиль (не больше реального max)"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(self.MIN_SECONDS * math.exp((index + 1) * self._log_growth), self.max)
+        return self.max
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, bucket_count in enumerate(other.counts):
+            if bucket_count:
+                self.counts[index] += bucket_count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def summary(self) -> dict:
+        """Секунды, округлённые до 0.1 мс"""
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 4) if self.count else 0.0,
+            "p50": round(self.percentile(50), 4),
+            "p90": round(self.percentile(90), 4),
+            "p99": round(self.percentile(99), 4),
+            "max": round(self.max, 4),
+        }
+
+
+class EndpointLatency:
+    """Гистограммы эндпоинта: общая и по исходу кеша (hit/miss/not_modified/none)"""
+
+    __slots__ = ("all", "by_cache")
+
+    def __init__(self):
+        self.all = LatencyHistogram()
+        self.by_cache = {status: LatencyHistogram() for status in CACHE_STATUSES}
+
+    def record(self, seconds: float, cache_status: str = "none"):
+        self.all.record(seconds)
+        self.by_cache.get(cache_status, self.by_cache["none"]).record(seconds)
+
+    def summary(self) -> dict:
+        result = self.all.summary()
+        result["by_cache"] = {status: h.summary() for status, h in self.by_cache.items() if h.count}
+        return result
+
+
+def install_sql_hooks(sync_engine: Engine):
+    """Считаем запросы и время БД текущего HTTP-запроса; медленные запросы пишем в лог"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("query_started")
+        if not stack:
+            return
+        seconds = time.perf_counter() - stack.pop()
+        add_timing("db", seconds)
+        if seconds * 1000 >= settings.SLOW_QUERY_MS:
+            logger.warning(f"🐢 Медленный SQL {seconds * 1000:.1f}ms: {' '.join(statement.split())[:300]}")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        # Упавший запрос не доходит до after_cursor_execute - снимаем его старт со стека
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
@@ -0,0 +1,79 @@
+import re
+from datetime import date, datetime
+
+# Дата дня в БД хранится как текст вида "Понедельник, 01.09.2025" (или ISO у записей, созданных через ORM)
+_DMY_RE = re.compile(r"(\d{2})\.(\d{2})\.(\d{4})")
+_ISO_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+
+
+WEEKDAY_NAMES = ("Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье")
+
+
+def day_label(day_date: date) -> str:
+    """Подпись дня в формате исходных данных: "Понедельник, 01.09.2025" """
+    return f"{WEEKDAY_NAMES[day_date.weekday()]}, {day_date:%d.%m.%Y}"
+
+
+def parse_day_date(value) -> date | None:
+    """Достаём календарную дату из значения days.date (date, datetime, ДД.ММ.ГГГГ или ГГГГ-ММ-ДД)"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text_value = str(value)
+    try:
+        match = _DMY_RE.search(text_value)
+        if match:
+            dd, mm, yyyy = match.groups()
+            return date(int(yyyy), int(mm), int(dd))
+        match = _ISO_RE.search(text_value)
+        if match:
+            yyyy, mm, dd = match.groups()
+            return date(int(yyyy), int(mm), int(dd))
+    except ValueError:
+        return None
+    return None
+
+
+def parse_iso_date(value: str) -> date | None:
+    """Строгий разбор даты из URL (YYYY-MM-DD)"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+_SPACES_RE = re.compile(r"\s+")
+_INITIALS_RE = re.compile(r"\.\s+(?=\w\.)")
+
+
+def clean_teacher_name(value) -> str | None:
+    """ФИО для отображения: без лишних пробелов, инициалы слитно ("Иванов И. И." -> "Иванов И.И.")"""
+    if value is None:
+        return None
+    cleaned = _INITIALS_RE.sub(".", _SPACES_RE.sub(" ", str(value)).strip())
+    return cleaned or None
+
+
+def canonical_teacher_name(value) -> str | None:
+    """Ключ преподавателя: варианты написания (регистр, ё/е, пробелы) схлопываются в одно значение"""
+    cleaned = clean_teacher_name(value)
+    if cleaned is None:
+        return None
+    return cleaned.casefold().replace("ё", "е")
+
+
+_TIME_RE = re.compile(r"(\d{1,2})[:.](\d{2})")
+
+
+def parse_lesson_time(value) -> tuple[int | None, int | None]:
+    """Минуты от полуночи для начала и конца пары: "13:35   - 15:10" -> (815, 910)"""
+    minutes = []
+    for hh, mm in _TIME_RE.findall(str(value or "")):
+        if int(hh) < 24 and int(mm) < 60:
+            minutes.append(int(hh) * 60 + int(mm))
+    start = minutes[0] if minutes else None
+    end = minutes[1] if len(minutes) > 1 else None
+    return start, end
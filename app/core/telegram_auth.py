@@ -0,0 +1,117 @@
+import hashlib
+import hmac
+import logging
+from functools import lru_cache
+from urllib.parse import parse_qsl
+
+import orjson
+
+from .cache import LocalCache
+from .config import settings
+
+logger = logging.getLogger("app")
+
+# Проверка Telegram initData один раз на запрос: middleware разбирает строку, проверяет HMAC
+# и кладёт результат в request.state.telegram_auth; ключ лимитера, зависимости авторизации
+# и сохранение пользователя берут его оттуда. Строки с верной подписью кешируются целиком, поэтому
+# повторные запросы той же сессии Mini App обходятся без парсинга и криптографии.
+
+# Откуда берём initData, по приоритету после тела POST (его разбирают зависимости - middleware тело не читает)
+INIT_DATA_HEADERS = ("telegram-init-data", "x-telegram-web-app-data", "x-init-data", "x-telegram-initdata")
+INIT_DATA_QUERY = ("tgWebAppData", "init_data")
+
+# Страница, статика и служебные файлы отдаются без авторизации - initData там не разбираем
+PUBLIC_PATHS = frozenset({"/", "/sitemap.xml", "/robots.txt", "/favicon.ico", "/metrics"})
+PUBLIC_PREFIXES = ("/static/",)
+
+
+class TelegramAuth:
+    """Результат разбора initData: пользователь (или None) и прошла ли подпись проверку"""
+
+    __slots__ = ("user", "verified", "src")
+
+    def __init__(self, user: dict | None, verified: bool, src: str):
+        self.user = user
+        self.verified = verified
+        self.src = src
+
+
+auth_cache = LocalCache(max_items=settings.AUTH_CACHE_MAX_ITEMS, ttl=settings.AUTH_CACHE_TTL)
+
+
+@lru_cache(maxsize=1)
+def secret_key(bot_token: str) -> bytes:
+    """Ключ HMAC для initData Mini App (HMAC-SHA256 токена с ключом "WebAppData"), один раз на токен"""
+    return hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+
+
+def normalize_init_data(init_data: str) -> str:
+    init_data = init_data.strip()
+    if len(init_data) >= 2 and init_data[0] == init_data[-1] and init_data[0] in "\"'":
+        init_data = init_data[1:-1]
+    return init_data
+
+
+def extract_user(data: dict) -> dict | None:
+    try:
+        if "user" in data:
+            u = orjson.loads(data["user"])
+            return {
+                "user_id": int(u.get("id")) if u.get("id") is not None else None,
+                "username": u.get("username"),
+                "first_name": u.get("first_name"),
+                "last_name": u.get("last_name"),
+                "language_code": u.get("language_code"),
+            }
+        if "user_id" in data:
+            return {"user_id": int(data["user_id"])}
+    except Exception:
+        pass
+    return None
+
+
+def check_signature(data: dict, bot_token: str | None) -> bool:
+    recv_hash = data.get("hash") or ""
+    if not bot_token or not recv_hash:
+        return False
+    # Строка проверки из всех полей, кроме hash, как в документации Telegram
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(data.items()) if k != "hash").encode()
+    local_hash = hmac.new(secret_key(bot_token), data_check_string, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(local_hash, recv_hash)
+
+
+def authenticate(init_data: str | None, src: str) -> TelegramAuth | None:
+    """Разбор и проверка initData (None, если initData нет). В кеше - только прошедшие проверку строки,
+    ключ - сама строка: подобранная коллизия или поток поддельных строк кеш не отравят и не вытеснят"""
+    if not init_data:
+        return None
+    init_data = normalize_init_data(init_data)
+    cached = auth_cache.get(init_data)
+    if cached is not None:
+        return cached
+
+    data = dict(parse_qsl(init_data, keep_blank_values=True, strict_parsing=False, encoding="utf-8", errors="ignore"))
+    verified = check_signature(data, settings.BOT_TOKEN)
+    if not verified:
+        # Неверная подпись не кешируется и проверяется на каждом запросе клиента - в WARNING это был бы поток
+        logger.debug("InitData HMAC mismatch (src=%s, len=%s)", src, len(init_data))
+    auth = TelegramAuth(extract_user(data), verified, src)
+    if verified:
+        auth_cache.set(init_data, auth)
+    return auth
+
+
+def is_api_path(path: str) -> bool:
+    return path not in PUBLIC_PATHS and not path.startswith(PUBLIC_PREFIXES)
+
+
+def find_init_data(headers, query_params) -> tuple[str | None, str]:
+    for header in INIT_DATA_HEADERS:
+        value = headers.get(header)
+        if value:
+            return value, f"hdr.{header}"
+    for param in INIT_DATA_QUERY:
+        value = query_params.get(param)
+        if value:
+            return value, f"qry.{param}"
+    return None, "none"
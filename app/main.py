@@ -1,30 +1,38 @@
 import asyncio
 import time
 from functools import wraps
-from fastapi import FastAPI, Depends, HTTPException, Path, Header, Request, Response
+from fastapi import FastAPI, Depends, HTTPException, Path, Query, Request, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, RedirectResponse, JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-import os
-import hmac
 import hashlib
-from urllib.parse import parse_qsl
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-import hmac as _hmaclib
 from fastapi.middleware.cors import CORSMiddleware
-import redis
-import json
-from datetime import datetime, timedelta
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+from datetime import datetime, date as date_type
 
-from .core.database import get_db
-from .services.schedule import ScheduleService
-from .schemas.schedule import Group, Day, Lesson, Teacher
+from .core.database import get_async_db, get_db_stats, db_stats, engine, async_engine
+from .services.schedule import AsyncScheduleService
+from .schemas.schedule import Group, Day, Lesson, Teacher, TeacherDay, SearchResult, GroupNow, TeacherNow, FreeClassrooms
 from .bot.bot import bot, setup_bot
 from .core.config import settings
-from .services.schedule import AuthHelpers
+from .core.cache import get_cache_stats, get_redis_stats, start_cache, stop_cache, serialize_payload
+from .services.cached_schedule import (
+    cached_group_day, cached_teacher_day, cached_group_range, cached_teacher_range, cached_groups, cached_teachers,
+    group_day_tag, teacher_day_tag, group_range_tag, teacher_range_tag, groups_list_tag, teachers_list_tag
+)
+from .services.warmup import warmup_loop
+from .services.user_writes import user_writes
+from .services.search import get_search_index, MAX_SEARCH_RESULTS
+from .services.timeline import group_now, teacher_now, local_now
+from .services.classrooms import find_free_classrooms, DEFAULT_LESSON_MINUTES
+from .core.parsing import parse_iso_date, parse_lesson_time
+from .core.telegram_auth import TelegramAuth, authenticate, find_init_data, is_api_path
+from .core.fleet_metrics import fleet_metrics, metrics_flush_loop, render_prometheus, fleet_summary
+from .core.metrics import start_request_timings, request_timings, timed, mark_cache, TIMING_NAMES, LatencyHistogram, EndpointLatency
 
 from aiogram.types import InlineQueryResultArticle, InputTextMessageContent
 from uuid import uuid4
@@ -34,101 +42,90 @@ import logging
 logger = logging.getLogger("app")
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 
-# --- Redis подключение ---
-try:
-    redis_client = redis.Redis(
-        host=os.getenv('REDIS_HOST', 'redis'),
-        port=int(os.getenv('REDIS_PORT', 6379)),
-        db=int(os.getenv('REDIS_DB', 0)),
-        password=os.getenv('REDIS_PASSWORD'),
-        decode_responses=True,
-        socket_connect_timeout=5,
-        socket_timeout=5
-    )
-    # Проверка подключения
-    redis_client.ping()
-    logger.info("✅ Redis подключен успешно")
-except Exception as e:
-    logger.warning(f"⚠️ Redis недоступен: {e}. Работаем без кеша")
-    redis_client = None
-
 # --- Система мониторинга ---
 # Счетчики для статистики
 api_stats = {
     "requests_count": 0,
     "errors_count": 0,
-    "response_times": [],
+    # Гистограммы задержек фиксированного размера: общая и по эндпоинтам (с разбивкой по исходу кеша)
+    "latency": LatencyHistogram(),
+    "endpoint_latency": {},
     "endpoints": {},
     "popular_groups": {},
     "popular_teachers": {}
 }
 
-# --- Система кеширования ---
-def get_cache_key(prefix: str, *args) -> str:
-    """Генерация ключа для кеша"""
-    return f"{prefix}:" + ":".join(str(arg) for arg in args)
-
-def is_cacheable_date(date_str: str) -> bool:
-    """Проверяем, стоит ли кешировать эту дату (только сегодня + завтра)"""
-    try:
-        target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        today = datetime.now().date()
-        tomorrow = today + timedelta(days=1)
-        return target_date in [today, tomorrow]
-    except:
+# Максимальная длина интервала для /schedule?from=&to=
+MAX_RANGE_DAYS = 62
+
+def parse_date_range(date_from: str, date_to: str) -> tuple[date_type, date_type]:
+    """Проверяем интервал дат из query-параметров"""
+    start = parse_iso_date(date_from)
+    end = parse_iso_date(date_to)
+    if start is None or end is None:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+    if end < start:
+        raise HTTPException(status_code=400, detail="'to' must not be earlier than 'from'")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_RANGE_DAYS} days")
+    return start, end
+
+def etag_matches(request: Request, etag: str | None) -> bool:
+    """If-None-Match: список через запятую, слабые W/-теги сравниваем по значению, '*' совпадает с любым"""
+    if not etag:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
         return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
 
-def get_cache_ttl(date_str: str) -> int:
-    """TTL для кеша: до 02:00 следующего дня"""
-    try:
-        target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        # Кеш истекает в 02:00 следующего дня после target_date
-        expire_datetime = datetime.combine(target_date + timedelta(days=1), datetime.min.time().replace(hour=2))
-        ttl = int((expire_datetime - datetime.now()).total_seconds())
-        return max(ttl, 60)  # Минимум 1 минута
-    except:
-        return 3600  # Fallback: 1 час
-
-def get_from_cache(cache_key: str):
-    """Безопасное получение из кеша"""
-    if not redis_client:
-        return None
-    try:
-        cached_data = redis_client.get(cache_key)
-        if cached_data:
-            return json.loads(cached_data)
-    except Exception as e:
-        logger.warning(f"❌ Ошибка чтения кеша {cache_key}: {e}")
+def cache_headers(etag: str | None) -> dict:
+    headers = {"Cache-Control": f"private, max-age={settings.HTTP_CACHE_MAX_AGE}"}
+    if etag:
+        headers["ETag"] = etag
+    return headers
+
+def not_modified(request: Request, etag: str | None) -> Response | None:
+    """304 без тела, если у клиента актуальная версия; проверяем до похода в кеш и БД"""
+    if etag_matches(request, etag):
+        mark_cache("not_modified")
+        return Response(status_code=304, headers=cache_headers(etag))
     return None
 
-def set_to_cache(cache_key: str, data, ttl: int):
-    """Безопасное сохранение в кеш"""
-    if not redis_client:
-        return
-    try:
-        redis_client.setex(cache_key, ttl, json.dumps(data, ensure_ascii=False, default=str))
-        logger.info(f"💾 Кеш сохранён: {cache_key} (TTL: {ttl}s)")
-    except Exception as e:
-        logger.warning(f"❌ Ошибка записи кеша {cache_key}: {e}")
-
-
+def json_bytes_response(body: bytes, request: Request, etag: str | None = None) -> Response:
+    """Быстрый путь: готовые байты из кеша/сборщика отдаём как есть, без повторной валидации и json.dumps.
+    Без версии (Redis недоступен) ETag считаем по самому телу: трафик экономится, работа сервера - нет"""
+    etag = etag or '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    return Response(content=body, media_type="application/json", headers=cache_headers(etag))
 
 def track_performance(endpoint_name: str):
     """Декоратор для отслеживания производительности API"""
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            start_time = time.time()
+            start_time = time.perf_counter()
             api_stats["requests_count"] += 1
             
             try:
                 result = await func(*args, **kwargs)
-                duration = time.time() - start_time
+                duration = time.perf_counter() - start_time
                 
                 # Сохраняем метрики
-                api_stats["response_times"].append(duration)
-                if len(api_stats["response_times"]) > 1000:  # Ограничиваем размер
-                    api_stats["response_times"] = api_stats["response_times"][-500:]
+                timings = request_timings.get()
+                cache_status = timings.cache_status if timings is not None else "none"
+                api_stats["latency"].record(duration)
+                if endpoint_name not in api_stats["endpoint_latency"]:
+                    api_stats["endpoint_latency"][endpoint_name] = EndpointLatency()
+                api_stats["endpoint_latency"][endpoint_name].record(duration, cache_status)
                 
                 if endpoint_name not in api_stats["endpoints"]:
                     api_stats["endpoints"][endpoint_name] = {"count": 0, "avg_time": 0}
@@ -136,13 +133,30 @@ def track_performance(endpoint_name: str):
                 stats = api_stats["endpoints"][endpoint_name]
                 stats["count"] += 1
                 stats["avg_time"] = (stats["avg_time"] * (stats["count"] - 1) + duration) / stats["count"]
+
+                # Средние по этапам запроса (SQL-хуки, кеш, авторизация, сериализация)
+                if timings is not None:
+                    db_stats["requests_with_checkout" if timings.checkouts else "requests_without_checkout"] += 1
+                    breakdown = {"db_queries": timings.counts["db"]}
+                    breakdown.update({f"{name}_time": timings.durations[name] for name in TIMING_NAMES})
+                    for key, value in breakdown.items():
+                        avg_key = f"avg_{key}"
+                        stats[avg_key] = (stats.get(avg_key, 0) * (stats["count"] - 1) + value) / stats["count"]
+
+                # Общие для всех воркеров счётчики (сбрасываются в Redis пачками)
+                fleet_metrics.record_request(
+                    endpoint_name, duration, cache_status,
+                    db_queries=timings.counts["db"] if timings is not None else 0,
+                    db_seconds=timings.durations["db"] if timings is not None else 0.0,
+                )
                 
                 logger.info(f"✅ {endpoint_name}: {duration:.3f}s")
                 return result
                 
             except Exception as e:
-                duration = time.time() - start_time
+                duration = time.perf_counter() - start_time
                 api_stats["errors_count"] += 1
+                fleet_metrics.record_request(endpoint_name, duration, error=True)
                 logger.error(f"❌ {endpoint_name}: {duration:.3f}s - {str(e)}")
                 raise
                 
@@ -180,6 +194,37 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"error": "Internal server error"}
     )
 
+class RequestContextMiddleware:
+    """Чистый ASGI-middleware (без BaseHTTPMiddleware: ни лишней задачи, ни прокладки тела ответа):
+    - Server-Timing: разбивка времени запроса (db/cache/auth/serialize) видна в DevTools браузера;
+    - Telegram initData из заголовков/query разбирается и проверяется один раз на запрос к API
+      (с кешем проверенных строк), результат - request.state.telegram_auth для лимитера и авторизации"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = start_request_timings()
+        state = scope.setdefault("state", {})
+        state["telegram_auth"] = None
+        if is_api_path(scope["path"]):
+            with timed("auth"):
+                init_data, src = find_init_data(Headers(scope=scope), QueryParams(scope.get("query_string", b"")))
+                state["telegram_auth"] = authenticate(init_data, src)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timings.server_timing())
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
+
+app.add_middleware(RequestContextMiddleware)
+
 # CORS: разрешаем только Telegram WebApp (можно расширить список)
 app.add_middleware(
     CORSMiddleware,
@@ -195,28 +240,12 @@ app.add_middleware(
 # Кастомная функция для извлечения user_id из Init Data
 
 def get_user_id_from_init_data(request: Request):
-    try:
-        # Читаем из заголовков (без попытки читать тело у async запроса)
-        for h in ("telegram-init-data", "x-telegram-web-app-data", "x-init-data", "x-telegram-initdata"):
-            v = request.headers.get(h)
-            if not v:
-                continue
-            try:
-                from urllib.parse import parse_qsl
-                import json
-                data = dict(parse_qsl(v, keep_blank_values=True, strict_parsing=False, encoding='utf-8', errors='ignore'))
-                if 'user' in data:
-                    u = json.loads(data['user'])
-                    uid = u.get('id')
-                    if uid is not None:
-                        return str(uid)
-            except Exception:
-                continue
-    except Exception:
-        pass
+    # initData уже разобрана auth-middleware (без чтения тела у async запроса)
+    auth = getattr(request.state, "telegram_auth", None)
+    if auth is not None and auth.user and auth.user.get("user_id") is not None:
+        return str(auth.user["user_id"])
     # Фоллбек: IP-адрес
     try:
-        from slowapi.util import get_remote_address
         return get_remote_address(request) or "anonymous"
     except Exception:
         return "anonymous"
@@ -229,98 +258,35 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # --- Проверка Init Data (перенесена выше, до использования в Depends) ---
-TELEGRAM_BOT_TOKEN = os.getenv("BOT_TOKEN")
-if TELEGRAM_BOT_TOKEN:
-    TELEGRAM_BOT_TOKEN = TELEGRAM_BOT_TOKEN.strip()
-
-# Если включён публичный доступ, отключим жёсткую проверку
-def _extract_init_data(request: Request, x_telegram_initdata: str | None) -> tuple[str | None, str]:
-    # 1) body (POST)
-    init_data = None
-    try:
-        # тело уже будет прочитано в verify, здесь только fallback
-        pass
-    except Exception:
-        pass
-    if init_data:
-        return init_data, "body.initData"
-
-    # 2) официальные/альтернативные заголовки (ПРИОРИТЕТ)
-    for h in ("telegram-init-data", "x-telegram-web-app-data", "x-init-data"):
-        v = request.headers.get(h)
-        if v:
-            return v, f"hdr.{h}"
-
-    # 3) наш заголовок (Fallback)
-    if x_telegram_initdata:
-        return x_telegram_initdata, "hdr.X-Telegram-InitData"
-
-    # 4) query
-    for q in ("tgWebAppData", "init_data"):
-        v = request.query_params.get(q)
-        if v:
-            return v, f"qry.{q}"
-
-    return None, "none"
-
+async def request_auth(request: Request) -> TelegramAuth | None:
+    """initData запроса по прежнему приоритету: тело POST, затем заголовки и query (их уже разобрал middleware)"""
+    auth = getattr(request.state, "telegram_auth", None)
+    if request.method == "POST" and not getattr(request.state, "telegram_body_checked", False):
+        request.state.telegram_body_checked = True
+        init_data = None
+        try:
+            body = await request.json()
+            if isinstance(body, dict):
+                init_data = body.get("initData") or body.get("init_data")
+        except Exception:
+            pass
+        if init_data:
+            auth = authenticate(init_data, "body.initData")
+            request.state.telegram_auth = auth
+    return auth
 
 def check_telegram_init_data(init_data: str, src: str) -> bool:
     if settings.ALLOW_PUBLIC:
         return True
-    
-    TELEGRAM_BOT_TOKEN = settings.BOT_TOKEN
-    
-    if not TELEGRAM_BOT_TOKEN or not init_data:
-        logger.warning("InitData empty or no BOT_TOKEN (src=%s)", src)
-        return False
-    try:
-        # Normalize init_data
-        init_data = init_data.strip()
-        if len(init_data) >= 2 and ((init_data[0] == '"' and init_data[-1] == '"') or (init_data[0] == "'" and init_data[-1] == "'")):
-            init_data = init_data[1:-1]
-        data = dict(parse_qsl(
-            init_data,
-            keep_blank_values=True,
-            strict_parsing=False,
-            encoding='utf-8',
-            errors='ignore'
-        ))
-        recv_hash = data.pop('hash', None) or ""
-        # Формируем строку проверки ИЗ ВСЕХ полученных полей (кроме hash), как в доках Telegram
-        data_check_string = '\n'.join(f"{k}={v}" for k, v in sorted(data.items()))
-        secret_key = hashlib.sha256(TELEGRAM_BOT_TOKEN.encode()).digest()
-        local_hmac = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
-        ok = _hmaclib.compare_digest(local_hmac, recv_hash)
-        if not ok:
-            logger.warning(
-                "InitData HMAC mismatch (src=%s, len=%s, recv=%s..., calc=%s...)",
-                src, len(init_data), recv_hash[:8], local_hmac[:8]
-            )
-        return ok
-    except Exception as e:
-        logger.warning("InitData parse error (src=%s): %s", src, e)
-        return False
+    auth = authenticate(init_data, src)
+    return auth is not None and auth.verified
 
-async def verify_init_data(request: Request, x_telegram_initdata: str = Header(None)):
+async def verify_init_data(request: Request):
     if settings.ALLOW_PUBLIC:
         return True
-    
-    # 1) читаем тело для POST
-    init_data_body = None
-    try:
-        body = await request.json()
-        if isinstance(body, dict):
-            init_data_body = body.get("initData") or body.get("init_data")
-    except Exception:
-        pass
-
-    if init_data_body:
-        init_data, src = init_data_body, "body.initData"
-    else:
-        init_data, src = _extract_init_data(request, x_telegram_initdata)
-
-    if not init_data or not check_telegram_init_data(init_data, src):
-        logger.info("Auth failed %s %s (src=%s)", request.method, request.url.path, src)
+    auth = await request_auth(request)
+    if auth is None or not auth.verified:
+        logger.info("Auth failed %s %s (src=%s)", request.method, request.url.path, auth.src if auth else "none")
         raise HTTPException(status_code=401, detail="Invalid Telegram Init Data")
     return True
 # --- Конец блока проверки Init Data ---
@@ -377,26 +343,11 @@ def _is_telegram_webview(request: Request) -> bool:
     logger.info("❌ Regular browser detected (no Telegram markers)")
     return False
 
-def _extract_user_from_init_data(init_data: str) -> dict | None:
-    try:
-        import json
-        data = dict(parse_qsl(init_data, keep_blank_values=True, strict_parsing=False, encoding='utf-8', errors='ignore'))
-        if 'user' in data:
-            u = json.loads(data['user'])
-            return {
-                "user_id": int(u.get('id')) if u.get('id') is not None else None,
-                "username": u.get('username'),
-                "first_name": u.get('first_name'),
-                "last_name": u.get('last_name'),
-                "language_code": u.get('language_code')
-            }
-        if 'user_id' in data:
-            return {"user_id": int(data['user_id'])}
-    except Exception:
-        pass
-    return None
+async def verify_telegram_mini_app(request: Request):
+    with timed("auth"):
+        return await _verify_telegram_mini_app(request)
 
-async def verify_telegram_mini_app(request: Request, x_telegram_initdata: str = Header(None)):
+async def _verify_telegram_mini_app(request: Request):
     # Проверяем веб-версию (?web=1) - разрешаем доступ для браузеров
     query_params = dict(request.query_params)
     if query_params.get('web') == '1':
@@ -410,24 +361,10 @@ async def verify_telegram_mini_app(request: Request, x_telegram_initdata: str =
             raise HTTPException(status_code=302, detail="Redirect to Telegram", headers={"Location": f"https://t.me/{bot_username}"})
         raise HTTPException(status_code=403, detail="Access denied: open via Telegram")
 
-    # Ищем initData из Telegram Mini App
-    init_data_body = None
-    try:
-        if request.method == "POST":
-            body = await request.json()
-            if isinstance(body, dict):
-                init_data_body = body.get("initData") or body.get("init_data")
-    except Exception:
-        pass
-    
-    if init_data_body:
-        init_data, src = init_data_body, "body.initData"
-    else:
-        init_data, src = _extract_init_data(request, x_telegram_initdata)
-
-    # Если есть initData - извлекаем пользователя
-    if init_data:
-        user = _extract_user_from_init_data(init_data)
+    # initData из Telegram Mini App (разобрана и проверена один раз на запрос)
+    auth = await request_auth(request)
+    if auth is not None:
+        user = auth.user
         if user and user.get("user_id"):
             logger.info("✅ Telegram user: %s (%s)", user.get("user_id"), user.get("username"))
             return user
@@ -490,8 +427,8 @@ Sitemap: https://raspisanie.space/static/sitemap.xml
 
 @app.get("/test_db")
 @limiter.limit("5/second;100/hour")
-async def test_db(request: Request, user: dict = Depends(verify_telegram_mini_app), db: Session = Depends(get_db)):
-    groups = ScheduleService.get_all_groups(db)
+async def test_db(request: Request, user: dict = Depends(verify_telegram_mini_app), db: AsyncSession = Depends(get_async_db)):
+    groups = await AsyncScheduleService.get_all_groups(db)
     return {"groups_count": len(groups), "groups": groups, "user": user}
 
 @app.get("/groups/", response_model=List[Group])
@@ -499,11 +436,13 @@ async def test_db(request: Request, user: dict = Depends(verify_telegram_mini_ap
 @track_performance("get_groups")
 async def get_groups(
     request: Request,
-    user: dict = Depends(verify_telegram_mini_app),
-    db: Session = Depends(get_db)
+    user: dict = Depends(verify_telegram_mini_app)
 ):
-    groups = ScheduleService.get_all_groups(db)
-    return groups
+    tag = await groups_list_tag()
+    cached = not_modified(request, tag.etag)
+    if cached:
+        return cached
+    return json_bytes_response(await cached_groups(tag), request, tag.etag)
 
 @app.get("/groups/{group_id}/schedule/{date}", response_model=Day)
 @limiter.limit("5/second;100/hour")
@@ -512,92 +451,193 @@ async def get_schedule(
     request: Request,
     group_id: int,
     date: str,
-    user: dict = Depends(verify_telegram_mini_app),
-    db: Session = Depends(get_db)
+    user: dict = Depends(verify_telegram_mini_app)
 ):
     # Отслеживаем популярность группы
     if str(group_id) not in api_stats["popular_groups"]:
         api_stats["popular_groups"][str(group_id)] = 0
     api_stats["popular_groups"][str(group_id)] += 1
     
-    # 🚀 Проверяем кеш для сегодня/завтра
-    if is_cacheable_date(date):
-        cache_key = get_cache_key("group_schedule", group_id, date)
-        cached_schedule = get_from_cache(cache_key)
-        if cached_schedule:
-            logger.info(f"💾 Schedule from cache: group_id={group_id}, date={date}, user={user.get('user_id')}")
-            return cached_schedule
-    
-    # Загружаем из БД
-    schedule = ScheduleService.get_schedule_by_date(db, group_id, date)
-    if not schedule:
+    # 🚀 ETag = хеш версионированного ключа: повторное открытие обходится без Redis и БД
+    tag = await group_day_tag(group_id, date)
+    cached = not_modified(request, tag.etag)
+    if cached:
+        return cached
+
+    # Кеш по версии группы; конкурентные промахи по одному ключу дают одну загрузку из БД
+    body = await cached_group_day(group_id, date, tag)
+    if body is None:
         logger.warning(f"📅 Schedule not found: group_id={group_id}, date={date}")
         raise HTTPException(status_code=404, detail="Schedule not found")
     
-    # 🚀 Сохраняем в кеш для сегодня/завтра
-    if is_cacheable_date(date):
-        cache_key = get_cache_key("group_schedule", group_id, date)
-        ttl = get_cache_ttl(date)
-        set_to_cache(cache_key, schedule, ttl)
-    
     logger.info(f"📅 Schedule loaded: group_id={group_id}, date={date}, user={user.get('user_id')}")
-    return schedule
+    return json_bytes_response(body, request, tag.etag)
+
+@app.get("/groups/{group_id}/schedule", response_model=List[Day])
+@limiter.limit("5/second;100/hour")
+@track_performance("get_group_schedule_range")
+async def get_schedule_range(
+    request: Request,
+    group_id: int,
+    date_from: str = Query(..., alias="from", description="Начало интервала, YYYY-MM-DD"),
+    date_to: str = Query(..., alias="to", description="Конец интервала включительно, YYYY-MM-DD"),
+    user: dict = Depends(verify_telegram_mini_app)
+):
+    start, end = parse_date_range(date_from, date_to)
+
+    if str(group_id) not in api_stats["popular_groups"]:
+        api_stats["popular_groups"][str(group_id)] = 0
+    api_stats["popular_groups"][str(group_id)] += 1
+
+    tag = await group_range_tag(group_id, start, end)
+    cached = not_modified(request, tag.etag)
+    if cached:
+        return cached
+
+    # 🚀 Кеш по неделям: неделя целиком = один ключ
+    days = await cached_group_range(group_id, start, end)
+    logger.info(f"📅 Schedule range loaded: group_id={group_id}, {start}..{end}, days={len(days)}, user={user.get('user_id')}")
+    return json_bytes_response(serialize_payload(days), request, tag.etag)
+
+@app.get("/groups/{group_id}/now", response_model=GroupNow)
+@limiter.limit("5/second;100/hour")
+@track_performance("get_group_now")
+async def get_group_now(
+    request: Request,
+    group_id: int,
+    user: dict = Depends(verify_telegram_mini_app)
+):
+    if str(group_id) not in api_stats["popular_groups"]:
+        api_stats["popular_groups"][str(group_id)] = 0
+    api_stats["popular_groups"][str(group_id)] += 1
+
+    # ⏰ Текущая и следующая пара: bisect по массиву начал пар из кешированного дня
+    return await group_now(group_id)
 
 @app.get("/days/{day_id}/lessons", response_model=List[Lesson])
 async def get_lessons(
     day_id: int,
     user: dict = Depends(verify_telegram_mini_app),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    return ScheduleService.get_lessons_by_day_id(db, day_id)
+    return await AsyncScheduleService.get_lessons_by_day_id(db, day_id)
 
 @app.get("/teachers/", response_model=List[Teacher])
 @track_performance("get_teachers")
 async def get_teachers(
     request: Request,
-    user: dict = Depends(verify_telegram_mini_app),
-    db: Session = Depends(get_db)
+    user: dict = Depends(verify_telegram_mini_app)
 ):
-    teachers = ScheduleService.get_all_teachers(db)
-    return teachers
+    tag = await teachers_list_tag()
+    cached = not_modified(request, tag.etag)
+    if cached:
+        return cached
+    return json_bytes_response(await cached_teachers(tag), request, tag.etag)
 
-@app.get("/teachers/{teacher_name}/schedule/{date}")
+@app.get("/teachers/{teacher_name}/schedule/{date}", response_model=TeacherDay)
 @limiter.limit("5/second;100/hour")
 @track_performance("get_teacher_schedule")
 async def get_teacher_schedule(
     request: Request,
     teacher_name: str = Path(..., description="ФИО преподавателя"),
     date: str = Path(..., description="Дата в формате YYYY-MM-DD"),
-    user: dict = Depends(verify_telegram_mini_app),
-    db: Session = Depends(get_db)
+    user: dict = Depends(verify_telegram_mini_app)
 ):
     # Отслеживаем популярность преподавателя
     if teacher_name not in api_stats["popular_teachers"]:
         api_stats["popular_teachers"][teacher_name] = 0
     api_stats["popular_teachers"][teacher_name] += 1
     
-    # 🚀 Проверяем кеш для сегодня/завтра
-    if is_cacheable_date(date):
-        cache_key = get_cache_key("teacher_schedule", teacher_name, date)
-        cached_schedule = get_from_cache(cache_key)
-        if cached_schedule:
-            logger.info(f"💾 Teacher schedule from cache: teacher={teacher_name}, date={date}, user={user.get('user_id')}")
-            return cached_schedule
-    
-    # Загружаем из БД
-    schedule = ScheduleService.get_teacher_schedule_by_date(db, teacher_name, date)
-    if not schedule:
+    tag = await teacher_day_tag(teacher_name, date)
+    cached = not_modified(request, tag.etag)
+    if cached:
+        return cached
+
+    # 🚀 Кеш по версии преподавателя; конкурентные промахи по одному ключу дают одну загрузку из БД
+    body = await cached_teacher_day(teacher_name, date, tag)
+    if body is None:
         logger.warning(f"👨‍🏫 Teacher schedule not found: teacher={teacher_name}, date={date}")
         raise HTTPException(status_code=404, detail="Schedule not found")
     
-    # 🚀 Сохраняем в кеш для сегодня/завтра
-    if is_cacheable_date(date):
-        cache_key = get_cache_key("teacher_schedule", teacher_name, date)
-        ttl = get_cache_ttl(date)
-        set_to_cache(cache_key, schedule, ttl)
-    
     logger.info(f"👨‍🏫 Teacher schedule loaded: teacher={teacher_name}, date={date}, user={user.get('user_id')}")
-    return schedule
+    return json_bytes_response(body, request, tag.etag)
+
+@app.get("/teachers/{teacher_name}/schedule", response_model=List[TeacherDay])
+@limiter.limit("5/second;100/hour")
+@track_performance("get_teacher_schedule_range")
+async def get_teacher_schedule_range(
+    request: Request,
+    teacher_name: str = Path(..., description="ФИО преподавателя"),
+    date_from: str = Query(..., alias="from", description="Начало интервала, YYYY-MM-DD"),
+    date_to: str = Query(..., alias="to", description="Конец интервала включительно, YYYY-MM-DD"),
+    user: dict = Depends(verify_telegram_mini_app)
+):
+    start, end = parse_date_range(date_from, date_to)
+
+    if teacher_name not in api_stats["popular_teachers"]:
+        api_stats["popular_teachers"][teacher_name] = 0
+    api_stats["popular_teachers"][teacher_name] += 1
+
+    tag = await teacher_range_tag(teacher_name, start, end)
+    cached = not_modified(request, tag.etag)
+    if cached:
+        return cached
+
+    days = await cached_teacher_range(teacher_name, start, end)
+    logger.info(f"👨‍🏫 Teacher schedule range loaded: teacher={teacher_name}, {start}..{end}, days={len(days)}, user={user.get('user_id')}")
+    return json_bytes_response(serialize_payload(days), request, tag.etag)
+
+@app.get("/teachers/{teacher_name}/now", response_model=TeacherNow)
+@limiter.limit("5/second;100/hour")
+@track_performance("get_teacher_now")
+async def get_teacher_now(
+    request: Request,
+    teacher_name: str = Path(..., description="ФИО преподавателя"),
+    user: dict = Depends(verify_telegram_mini_app)
+):
+    if teacher_name not in api_stats["popular_teachers"]:
+        api_stats["popular_teachers"][teacher_name] = 0
+    api_stats["popular_teachers"][teacher_name] += 1
+
+    return await teacher_now(teacher_name)
+
+@app.get("/classrooms/free", response_model=FreeClassrooms)
+@limiter.limit("5/second;100/hour")
+@track_performance("get_free_classrooms")
+async def get_free_classrooms(
+    request: Request,
+    day: str | None = Query(None, alias="date", description="Дата YYYY-MM-DD, по умолчанию сегодня"),
+    time_from: str | None = Query(None, alias="from", description="Начало интервала ЧЧ:ММ, по умолчанию сейчас"),
+    time_to: str | None = Query(None, alias="to", description="Конец интервала ЧЧ:ММ, по умолчанию +1 пара"),
+    user: dict = Depends(verify_telegram_mini_app),
+    db: AsyncSession = Depends(get_async_db)
+):
+    now = local_now()
+    day_date = parse_iso_date(day) if day else now.date()
+    start = parse_lesson_time(time_from)[0] if time_from else now.hour * 60 + now.minute
+    end = parse_lesson_time(time_to)[0] if time_to else (start + DEFAULT_LESSON_MINUTES if start is not None else None)
+    if day_date is None or start is None or end is None:
+        raise HTTPException(status_code=400, detail="Expected date=YYYY-MM-DD, from=HH:MM, to=HH:MM")
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'to' must be later than 'from'")
+
+    # 🏫 Индекс занятости на дату строится один раз на версию импорта, дальше bisect по аудиториям
+    classrooms = await find_free_classrooms(db, day_date, start, end)
+    return {"date": day_date.isoformat(), "start_minute": start, "end_minute": end, "classrooms": classrooms}
+
+@app.get("/search", response_model=List[SearchResult])
+@limiter.limit("20/second;1000/hour")
+@track_performance("search")
+async def search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100, description="Начало названия группы или ФИО"),
+    limit: int = Query(10, ge=1, le=MAX_SEARCH_RESULTS),
+    user: dict = Depends(verify_telegram_mini_app),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # 🔎 Автодополнение из индекса в памяти; БД трогаем только при пересборке после импорта
+    index = await get_search_index(db)
+    return index.search(q, limit)
 
 # Пример защищённого эндпоинта
 @app.post("/secure-endpoint")
@@ -605,7 +645,7 @@ async def get_teacher_schedule(
 async def secure_endpoint(
     request: Request,
     user: dict = Depends(verify_telegram_mini_app),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Ваш код для защищённого эндпоинта
     return {"status": "ok"}
@@ -621,28 +661,21 @@ async def whoami(user: dict = Depends(verify_telegram_mini_app)):
     }
 
 @app.get("/user/selection")
-async def get_user_selection(user: dict = Depends(verify_telegram_mini_app), db: Session = Depends(get_db)):
+async def get_user_selection(user: dict = Depends(verify_telegram_mini_app), db: AsyncSession = Depends(get_async_db)):
     if user.get('user_id') == "public":
         return {"last_selected_group_id": None, "last_selected_teacher": None}
-    AuthHelpers.upsert_user(db, user)
-    from .models.schedule import User
-    u = db.query(User).filter(User.tg_user_id == user.get('user_id')).first()
-    if not u:
-        return {"last_selected_group_id": None, "last_selected_teacher": None}
-    return {
-        "last_selected_group_id": u.last_selected_group_id,
-        "last_selected_teacher": u.last_selected_teacher,
-    }
+    # Обновление профиля/last_seen уходит в БД пачкой (write-behind), чтение его не ждёт
+    user_writes.touch(user)
+    return await user_writes.get_selection(db, user.get('user_id'))
 
 @app.post("/user/selection")
-async def set_user_selection(request: Request, user: dict = Depends(verify_telegram_mini_app), db: Session = Depends(get_db)):
+async def set_user_selection(request: Request, user: dict = Depends(verify_telegram_mini_app)):
     body = await request.json()
     if user.get('user_id') == "public":
         return {"ok": True}
-    AuthHelpers.upsert_user(db, user)
-    AuthHelpers.save_last_selection(
-        db,
-        user_id=user.get('user_id'),
+    user_writes.touch(user)
+    user_writes.save_selection(
+        user.get('user_id'),
         group_id=body.get('group_id'),
         teacher=body.get('teacher'),
     )
@@ -660,10 +693,9 @@ async def config_public():
 async def get_api_stats():
     """Эндпоинт для просмотра статистики API"""
     
-    # Вычисляем среднее время ответа
-    avg_response_time = 0
-    if api_stats["response_times"]:
-        avg_response_time = sum(api_stats["response_times"]) / len(api_stats["response_times"])
+    # Среднее и перцентили времени ответа
+    latency = api_stats["latency"]
+    avg_response_time = latency.total / latency.count if latency.count else 0
     
     # Топ-5 популярных групп
     top_groups = sorted(
@@ -680,29 +712,40 @@ async def get_api_stats():
     )[:5]
     
     # 🚀 Информация о кеше Redis
-    cache_info = {"status": "disabled", "keys_count": 0, "memory_usage": "N/A"}
-    if redis_client:
-        try:
-            cache_info = {
-                "status": "connected",
-                "keys_count": len(redis_client.keys("*")),
-                "memory_usage": redis_client.info("memory").get("used_memory_human", "N/A"),
-                "sample_keys": redis_client.keys("*")[:10]  # Первые 10 ключей для примера
-            }
-        except Exception as e:
-            cache_info = {"status": "error", "error": str(e)}
+    # SCAN-выборка вместо KEYS (KEYS блокирует весь Redis), результат кешируется на CACHE_STATS_TTL
+    cache_info = {**await get_redis_stats(), "tiers": get_cache_stats()}
+    fleet_values, fleet_source = await fleet_metrics.collect()
     
     return {
         "total_requests": api_stats["requests_count"],
         "total_errors": api_stats["errors_count"],
         "error_rate": round(api_stats["errors_count"] / max(api_stats["requests_count"], 1) * 100, 2),
         "avg_response_time": round(avg_response_time, 3),
-        "endpoints": api_stats["endpoints"],
+        "latency": latency.summary(),
+        "endpoints": {
+            name: {**stats, "latency": api_stats["endpoint_latency"][name].summary()}
+            if name in api_stats["endpoint_latency"] else stats
+            for name, stats in api_stats["endpoints"].items()
+        },
         "top_groups": [{"group_id": gid, "requests": count} for gid, count in top_groups],
         "top_teachers": [{"teacher": name, "requests": count} for name, count in top_teachers],
-        "cache": cache_info
+        "cache": cache_info,
+        "user_writes": user_writes.get_stats(),
+        "db": get_db_stats(),
+        # Счётчики выше - только этого воркера; здесь итоги всех воркеров (source=local, если Redis недоступен)
+        "fleet": {**fleet_summary(fleet_values), "source": fleet_source}
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Метрики всех воркеров в текстовом формате Prometheus"""
+    values, source = await fleet_metrics.collect()
+    return PlainTextResponse(
+        render_prometheus(values),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+        headers={"X-Metrics-Source": source},
+    )
+
 
 
 @app.post("/webapp/submit")
@@ -730,6 +773,16 @@ async def webapp_submit(request: Request, user: dict = Depends(verify_telegram_m
 # Запуск бота при старте приложения
 @app.on_event("startup")
 async def startup_event():
+    await start_cache()
+    # Сброс метрик воркера в общий Redis-хеш (для /metrics по всем воркерам)
+    app.state.metrics_task = asyncio.create_task(metrics_flush_loop())
+    # Отложенная запись пользователей (last_seen, выбор группы/преподавателя)
+    app.state.user_writes_task = asyncio.create_task(user_writes.run())
+    # Прогрев кеша популярных групп/преподавателей: сейчас, ежедневно и после импортов
+    if settings.WARMUP_ENABLED:
+        app.state.warmup_task = asyncio.create_task(
+            warmup_loop(lambda: (api_stats["popular_groups"], api_stats["popular_teachers"]))
+        )
     # Запускаем бота в отдельном потоке через executor, чтобы /start работал
     import threading
     from .bot.bot import run_bot
@@ -738,6 +791,27 @@ async def startup_event():
 # Закрытие сессии бота при остановке приложения
 @app.on_event("shutdown")
 async def shutdown_event():
+    warmup_task = getattr(app.state, "warmup_task", None)
+    if warmup_task:
+        warmup_task.cancel()
+    metrics_task = getattr(app.state, "metrics_task", None)
+    if metrics_task:
+        metrics_task.cancel()
+    await fleet_metrics.flush()
+    user_writes_task = getattr(app.state, "user_writes_task", None)
+    if user_writes_task:
+        # Не cancel: даём задаче закончить пачку, которая пишется прямо сейчас
+        user_writes.stop()
+        try:
+            await asyncio.wait_for(user_writes_task, timeout=settings.USER_FLUSH_INTERVAL * 2)
+        except Exception as e:
+            logger.warning(f"⚠️ Фоновая запись пользователей не остановилась штатно: {e}")
+    # Несброшенные обновления пользователей пишем до закрытия соединений
+    await user_writes.flush()
+    await stop_cache()
+    # Закрываем соединения: последнее закрытое соединение SQLite делает checkpoint WAL в основной файл
+    await async_engine.dispose()
+    engine.dispose()
     try:
         await bot.session.close()
     except Exception:
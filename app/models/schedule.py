@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, BigInteger
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, BigInteger, Index, event, inspect, select
+from sqlalchemy.orm import Session, relationship
 from ..core.database import Base
+from ..core.parsing import parse_day_date, clean_teacher_name, canonical_teacher_name, parse_lesson_time
 from datetime import datetime
 
 class Group(Base):
@@ -15,21 +16,106 @@ class Day(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date)
+    # Нормализованная календарная дата: по ней идут все выборки (date остаётся для отображения)
+    day_date = Column(Date, nullable=True)
+    # Отпечаток пар дня (services.importer.day_fingerprint): инкрементальный импорт пропускает совпавшие дни
+    fingerprint = Column(String(32), nullable=True)
     group_id = Column(Integer, ForeignKey("groups.id"))
     group = relationship("Group", back_populates="days")
     lessons = relationship("Lesson", back_populates="day")
 
+    __table_args__ = (
+        Index("ix_days_group_id_day_date", "group_id", "day_date"),
+        Index("ix_days_day_date", "day_date"),
+    )
+
+@event.listens_for(Day, "before_insert")
+@event.listens_for(Day, "before_update")
+def _fill_day_date(mapper, connection, target):
+    parsed = parse_day_date(target.date)
+    if parsed is not None:
+        target.day_date = parsed
+
+class Teacher(Base):
+    __tablename__ = "teachers"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Первое встреченное написание ФИО - для отображения
+    name = Column(String, nullable=False)
+    # Ключ поиска и кеша: canonical_teacher_name(name)
+    canonical_name = Column(String, unique=True, index=True, nullable=False)
+    lessons = relationship("Lesson", back_populates="teacher_ref")
+
 class Lesson(Base):
     __tablename__ = "lessons"
     
     id = Column(Integer, primary_key=True, index=True)
     day_id = Column(Integer, ForeignKey("days.id"))
     time = Column(String)
+    # Минуты от полуночи, разобранные из time: сортировка и "что сейчас" без разбора строк
+    start_minute = Column(Integer, nullable=True)
+    end_minute = Column(Integer, nullable=True)
     subject = Column(String)
     type = Column(String)
     classroom = Column(String)
     teacher = Column(String)
+    teacher_id = Column(Integer, ForeignKey("teachers.id"), nullable=True, index=True)
     day = relationship("Day", back_populates="lessons")
+    teacher_ref = relationship("Teacher", back_populates="lessons")
+
+    __table_args__ = (
+        Index("ix_lessons_day_id_start_minute", "day_id", "start_minute"),
+    )
+
+@event.listens_for(Lesson, "before_insert")
+@event.listens_for(Lesson, "before_update")
+def _fill_lesson_minutes(mapper, connection, target):
+    target.start_minute, target.end_minute = parse_lesson_time(target.time)
+
+def resolve_teacher_ids(connection, names: dict[str, str], known: dict[str, int]) -> dict[str, int]:
+    """canonical_name -> id для всех names (canonical -> написание ФИО): один IN-запрос на недостающие,
+    отсутствующих в справочнике вставляем одним executemany"""
+    missing = [canonical for canonical in names if canonical not in known]
+    if not missing:
+        return known
+    teachers = Teacher.__table__
+    found = dict(connection.execute(
+        select(teachers.c.canonical_name, teachers.c.id).where(teachers.c.canonical_name.in_(missing))
+    ).all())
+    new = [canonical for canonical in missing if canonical not in found]
+    if new:
+        connection.execute(teachers.insert(), [{"name": names[c], "canonical_name": c} for c in new])
+        found.update(connection.execute(
+            select(teachers.c.canonical_name, teachers.c.id).where(teachers.c.canonical_name.in_(new))
+        ).all())
+    known.update(found)
+    return known
+
+@event.listens_for(Session, "before_flush")
+def _fill_teacher_ids(session, flush_context, instances):
+    # Импорты пишут только текстовое ФИО; строки справочника находим/создаём пачкой на весь flush
+    # (а не SELECT/INSERT на каждую пару). Карта canonical -> id живёт в session.info до отката
+    lessons = [
+        obj for obj in (*session.new, *session.dirty)
+        if isinstance(obj, Lesson) and (obj in session.new or inspect(obj).attrs.teacher.history.has_changes())
+    ]
+    if not lessons:
+        return
+    names = {}
+    for lesson in lessons:
+        canonical = canonical_teacher_name(lesson.teacher)
+        if canonical is not None:
+            names.setdefault(canonical, clean_teacher_name(lesson.teacher))
+    known = session.info.setdefault("teacher_ids", {})
+    if names:
+        known = resolve_teacher_ids(session.connection(), names, known)
+    for lesson in lessons:
+        lesson.teacher_id = known.get(canonical_teacher_name(lesson.teacher))
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_teacher_ids(session, previous_transaction):
+    # Вставленные в откаченной транзакции преподаватели исчезли вместе с ней
+    session.info.pop("teacher_ids", None)
 
 class User(Base):
     __tablename__ = "users"
@@ -7,6 +7,8 @@ class LessonBase(BaseModel):
     type: str
     classroom: Optional[str] = None
     teacher: Optional[str] = None
+    start_minute: Optional[int] = None  # Минуты от полуночи
+    end_minute: Optional[int] = None
 
 class LessonCreate(LessonBase):
     day_id: int
@@ -27,6 +29,7 @@ class DayCreate(DayBase):
 
 class Day(DayBase):
     id: int
+    day_date: Optional[str] = None
     lessons: List[Lesson] = []
 
     class Config:
@@ -43,4 +46,40 @@ class Teacher(BaseModel):
     name: str
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class TeacherLesson(LessonBase):
+    id: int
+    day_id: int
+    group_id: int
+
+class TeacherDay(BaseModel):
+    date: str
+    day_date: Optional[str] = None
+    teacher: str
+    lessons: List[TeacherLesson] = []
+
+class SearchResult(BaseModel):
+    type: str  # "group" | "teacher"
+    id: Optional[int] = None
+    name: str
+
+class GroupNow(BaseModel):
+    date: str
+    minute: int  # Текущая минута дня
+    current: Optional[Lesson] = None
+    next: Optional[Lesson] = None
+    next_date: Optional[str] = None  # День следующей пары (может быть не сегодня)
+
+class TeacherNow(BaseModel):
+    date: str
+    minute: int
+    current: Optional[TeacherLesson] = None
+    next: Optional[TeacherLesson] = None
+    next_date: Optional[str] = None
+
+class FreeClassrooms(BaseModel):
+    date: str
+    start_minute: int
+    end_minute: int
+    classrooms: List[str] = []
@@ -1,3 +1,3 @@
-from .schedule import ScheduleService
+from .schedule import ScheduleService, AsyncScheduleService
 
-__all__ = ["ScheduleService"]
+__all__ = ["ScheduleService", "AsyncScheduleService"]
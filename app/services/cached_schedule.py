@@ -0,0 +1,173 @@
+import hashlib
+from datetime import date, timedelta
+from typing import Optional
+
+from ..core.cache import (
+    get_cache_key, get_from_cache, set_to_cache, get_or_load, singleflight,
+    get_schedule_version, group_scope, teacher_scope, IMPORTS_FIELD, UNKNOWN_VERSION
+)
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.parsing import parse_iso_date, canonical_teacher_name
+from .schedule import AsyncScheduleService
+
+# Ключи расписаний содержат версию группы/преподавателя (её увеличивает импорт),
+# поэтому кешировать можно любую дату: изменённые данные просто получат новый ключ.
+# Обработчики API и прогрев кеша (warmup) используют одни и те же функции, чтобы ключи совпадали.
+# Загрузка идёт в задаче singleflight и переживает отмену запроса, который её начал, поэтому
+# сессию БД она открывает сама: сессию запроса get_async_db закроет, пока загрузка ещё идёт.
+
+# Меняем вместе с форматом payload: старые записи кеша и ETag клиентов перестанут совпадать
+PAYLOAD_REVISION = 2
+
+
+class CacheTag:
+    """Версионированный ключ кеша; для известной версии он же определяет ETag ответа"""
+
+    def __init__(self, key: str, version: str):
+        self.key = key
+        self.versioned = version != UNKNOWN_VERSION
+
+    @property
+    def etag(self) -> str | None:
+        if not self.versioned:
+            return None
+        return '"' + hashlib.blake2b(self.key.encode(), digest_size=16).hexdigest() + '"'
+
+
+async def _tag(prefix: str, scope: str, *parts) -> CacheTag:
+    version = await get_schedule_version(scope)
+    return CacheTag(get_cache_key(prefix, *parts[:1], f"r{PAYLOAD_REVISION}.v{version}", *parts[1:]), version)
+
+
+async def group_day_tag(group_id: int, date_str: str) -> CacheTag:
+    return await _tag("group_schedule", group_scope(group_id), group_id, date_str)
+
+
+async def teacher_day_tag(teacher_name: str, date_str: str) -> CacheTag:
+    # В ключах канонический ФИО: "Иванов И. И." и "иванов и.и." попадают в одну запись
+    teacher_key = canonical_teacher_name(teacher_name) or teacher_name
+    return await _tag("teacher_schedule", teacher_scope(teacher_name), teacher_key, date_str)
+
+
+async def group_range_tag(group_id: int, start: date, end: date) -> CacheTag:
+    return await _tag("group_range", group_scope(group_id), group_id, start.isoformat(), end.isoformat())
+
+
+async def teacher_range_tag(teacher_name: str, start: date, end: date) -> CacheTag:
+    teacher_key = canonical_teacher_name(teacher_name) or teacher_name
+    return await _tag("teacher_range", teacher_scope(teacher_name), teacher_key, start.isoformat(), end.isoformat())
+
+
+async def groups_list_tag() -> CacheTag:
+    # Список групп меняет любой импорт
+    return await _tag("groups", IMPORTS_FIELD, "all")
+
+
+async def teachers_list_tag() -> CacheTag:
+    return await _tag("teachers", IMPORTS_FIELD, "all")
+
+
+def with_session(load):
+    """Загрузчик со своей сессией на время загрузки: load(db, *args)"""
+    async def run(*args):
+        async with AsyncSessionLocal() as db:
+            return await load(db, *args)
+    return run
+
+
+def get_week_starts(start: date, end: date) -> list[date]:
+    """Понедельники всех недель, пересекающихся с интервалом"""
+    monday = start - timedelta(days=start.weekday())
+    weeks = []
+    while monday <= end:
+        weeks.append(monday)
+        monday += timedelta(days=7)
+    return weeks
+
+
+async def load_weeks_cached(prefix: str, owner, version: str, start: date, end: date, loader) -> list:
+    """Собираем интервал из недельных кусков кеша; недостающие недели грузим одним запросом"""
+    weeks = get_week_starts(start, end)
+    owner = f"{owner}:r{PAYLOAD_REVISION}.v{version}"
+    # Без известной версии недели держим только в L1: в Redis они пережили бы следующий импорт
+    l2 = version != UNKNOWN_VERSION
+    days_by_week = {}
+    missing = []
+    for monday in weeks:
+        cached_week = await get_from_cache(get_cache_key(prefix, owner, monday.isoformat()), l2)
+        if cached_week is not None:
+            days_by_week[monday] = cached_week
+        else:
+            missing.append(monday)
+
+    if missing:
+        span_from, span_to = missing[0], missing[-1] + timedelta(days=6)
+        loaded = await singleflight(
+            get_cache_key(prefix, owner, span_from.isoformat(), span_to.isoformat()),
+            lambda: loader(span_from, span_to)
+        )
+        buckets = {monday: [] for monday in missing}
+        for day in loaded:
+            day_date = parse_iso_date(day.get("day_date") or "")
+            if day_date is None:
+                continue
+            monday = day_date - timedelta(days=day_date.weekday())
+            if monday in buckets:
+                buckets[monday].append(day)
+        for monday, week_days in buckets.items():
+            await set_to_cache(get_cache_key(prefix, owner, monday.isoformat()), week_days, settings.SCHEDULE_CACHE_TTL, l2)
+        days_by_week.update(buckets)
+
+    start_iso, end_iso = start.isoformat(), end.isoformat()
+    return [
+        day
+        for monday in weeks
+        for day in days_by_week[monday]
+        if start_iso <= (day.get("day_date") or "") <= end_iso
+    ]
+
+
+async def cached_group_day(group_id: int, date_str: str, tag: CacheTag | None = None) -> Optional[bytes]:
+    """Готовый JSON дня группы через кеш; конкурентные промахи по одному ключу дают одну загрузку из БД"""
+    tag = tag or await group_day_tag(group_id, date_str)
+    return await get_or_load(
+        tag.key,
+        with_session(lambda db: AsyncScheduleService.get_schedule_by_date(db, group_id, date_str)),
+        settings.SCHEDULE_CACHE_TTL,
+        tag.versioned
+    )
+
+
+async def cached_teacher_day(teacher_name: str, date_str: str, tag: CacheTag | None = None) -> Optional[bytes]:
+    tag = tag or await teacher_day_tag(teacher_name, date_str)
+    return await get_or_load(
+        tag.key,
+        with_session(lambda db: AsyncScheduleService.get_teacher_schedule_by_date(db, teacher_name, date_str)),
+        settings.SCHEDULE_CACHE_TTL,
+        tag.versioned
+    )
+
+
+async def cached_group_range(group_id: int, start: date, end: date) -> list:
+    return await load_weeks_cached(
+        "group_week", group_id, await get_schedule_version(group_scope(group_id)), start, end,
+        with_session(lambda db, week_from, week_to: AsyncScheduleService.get_schedule_by_range(db, group_id, week_from, week_to))
+    )
+
+
+async def cached_teacher_range(teacher_name: str, start: date, end: date) -> list:
+    return await load_weeks_cached(
+        "teacher_week", canonical_teacher_name(teacher_name) or teacher_name, await get_schedule_version(teacher_scope(teacher_name)), start, end,
+        with_session(lambda db, week_from, week_to: AsyncScheduleService.get_teacher_schedule_by_range(db, teacher_name, week_from, week_to))
+    )
+
+
+async def cached_groups(tag: CacheTag | None = None) -> bytes:
+    tag = tag or await groups_list_tag()
+    return await get_or_load(tag.key, with_session(AsyncScheduleService.get_all_groups), settings.SCHEDULE_CACHE_TTL, tag.versioned)
+
+
+async def cached_teachers(tag: CacheTag | None = None) -> bytes:
+    tag = tag or await teachers_list_tag()
+    return await get_or_load(tag.key, with_session(AsyncScheduleService.get_all_teachers), settings.SCHEDULE_CACHE_TTL, tag.versioned)
@@ -0,0 +1,100 @@
+from bisect import bisect_right
+from datetime import date
+
+from sqlalchemy import text, bindparam, Date
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.cache import LocalCache, singleflight, get_schedule_version, IMPORTS_FIELD
+from ..core.config import settings
+
+# Свободные аудитории: на каждую дату один раз строим индекс занятости
+# (отсортированные непересекающиеся интервалы по каждой аудитории), дальше
+# проверка аудитории - один bisect. Ключ содержит версию импорта.
+
+# Длительность пары, если в строке времени нет конца
+DEFAULT_LESSON_MINUTES = 90
+
+DAY_OCCUPANCY_QUERY = text(
+    """
+    SELECT l.classroom, l.start_minute, l.end_minute
+    FROM days d
+    JOIN lessons l ON l.day_id = d.id
+    WHERE d.day_date = :day_date AND l.classroom IS NOT NULL AND l.classroom != '' AND l.start_minute IS NOT NULL
+    """
+).bindparams(bindparam("day_date", type_=Date))
+
+# Все известные аудитории (не только занятые в этот день); читается один раз на версию импорта
+CLASSROOMS_QUERY = text("SELECT DISTINCT classroom FROM lessons WHERE classroom IS NOT NULL AND classroom != ''")
+
+occupancy_cache = LocalCache(max_items=64, ttl=settings.CACHE_L1_TTL)
+
+
+class OccupancyIndex:
+    """Занятость аудиторий на одну дату: room -> (starts, ends) слитых интервалов [start, end)"""
+
+    def __init__(self, rows):
+        intervals = {}
+        for classroom, start, end in rows:
+            room = classroom.strip()
+            if not room:
+                continue
+            if end is None or end <= start:
+                end = start + DEFAULT_LESSON_MINUTES
+            intervals.setdefault(room, []).append((start, end))
+
+        self.rooms = {}
+        for room, spans in intervals.items():
+            spans.sort()
+            starts, ends = [], []
+            for start, end in spans:
+                # Пересекающиеся/смежные пары (подгруппы, сдвоенные пары) сливаем в один интервал
+                if ends and start <= ends[-1]:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self.rooms[room] = (starts, ends)
+
+    def is_free(self, room: str, start: int, end: int) -> bool:
+        spans = self.rooms.get(room)
+        if spans is None:
+            return True
+        starts, ends = spans
+        # Первый интервал, заканчивающийся позже start; занято, если он начинается раньше end
+        position = bisect_right(ends, start)
+        return position == len(starts) or starts[position] >= end
+
+    def free_rooms(self, all_rooms: list, start: int, end: int) -> list:
+        return [room for room in all_rooms if self.is_free(room, start, end)]
+
+
+async def _load_index(db: AsyncSession, version: str, day_date: date) -> OccupancyIndex:
+    cache_key = f"occupancy:{version}:{day_date.isoformat()}"
+    index = occupancy_cache.get(cache_key)
+    if index is None:
+        async def load():
+            result = await db.execute(DAY_OCCUPANCY_QUERY, {"day_date": day_date})
+            return OccupancyIndex(result.fetchall())
+        index = await singleflight(cache_key, load)
+        occupancy_cache.set(cache_key, index)
+    return index
+
+
+async def _load_rooms(db: AsyncSession, version: str) -> list:
+    cache_key = f"classrooms:{version}"
+    rooms = occupancy_cache.get(cache_key)
+    if rooms is None:
+        async def load():
+            result = await db.execute(CLASSROOMS_QUERY)
+            return sorted({row[0].strip() for row in result if row[0].strip()})
+        rooms = await singleflight(cache_key, load)
+        occupancy_cache.set(cache_key, rooms)
+    return rooms
+
+
+async def find_free_classrooms(db: AsyncSession, day_date: date, start: int, end: int) -> list:
+    """Аудитории, свободные весь интервал [start, end) минут дня"""
+    version = await get_schedule_version(IMPORTS_FIELD)
+    rooms = await _load_rooms(db, version)
+    index = await _load_index(db, version, day_date)
+    return index.free_rooms(rooms, start, end)
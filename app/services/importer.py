@@ -0,0 +1,382 @@
+import csv
+import hashlib
+import json
+import logging
+import time
+from datetime import date
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from sqlalchemy import select, delete, tuple_, bindparam, String
+from sqlalchemy.engine import Connection
+
+from ..core.parsing import parse_day_date, parse_lesson_time, clean_teacher_name, canonical_teacher_name, day_label
+from ..models.schedule import Group, Day, Lesson, Teacher
+
+logger = logging.getLogger("app")
+
+# Потоковый импорт расписания: файл -> генератор записей -> пачки -> Core executemany.
+# ORM-события (day_date, teacher_id, минуты) здесь не срабатывают, поэтому всё вычисляем сами;
+# id групп, дней и преподавателей держим в словарях вместо flush после каждой строки.
+
+BATCH_SIZE = 2000
+
+# Поля плоской записи: одна строка = одна пара
+RECORD_FIELDS = ("group", "date", "time", "subject", "type", "classroom", "teacher")
+
+groups_table = Group.__table__
+days_table = Day.__table__
+lessons_table = Lesson.__table__
+teachers_table = Teacher.__table__
+
+
+class InvalidRecord(ValueError):
+    """Строка файла, которую нельзя импортировать"""
+
+
+def _flatten(document) -> Iterator[dict]:
+    # {"groups": [{"name", "days": [{"date", "lessons": [...]}]}]} -> плоские записи
+    if isinstance(document, list):
+        yield from document
+        return
+    for group in document.get("groups", []):
+        for day in group.get("days", []):
+            for lesson in day.get("lessons", []):
+                yield {**lesson, "group": group.get("name"), "date": day.get("date")}
+
+
+def read_records(path: str) -> Iterator[dict]:
+    """CSV (заголовок = RECORD_FIELDS), JSON Lines или JSON (список записей либо groups/days/lessons).
+    CSV и JSON Lines читаются построчно; JSON-документ загружается в память целиком -
+    для больших выгрузок используйте JSON Lines"""
+    file_path = Path(path)
+    suffix = file_path.suffix.lower()
+    with file_path.open(encoding="utf-8-sig", newline="") as f:
+        if suffix == ".csv":
+            yield from csv.DictReader(f)
+        elif suffix in (".jsonl", ".ndjson"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from _flatten(json.load(f))
+
+
+def normalize_records(records: Iterable[dict]) -> Iterator[dict]:
+    """Разбор дат, времени и ФИО; битые записи пропускаем с предупреждением"""
+    for number, record in enumerate(records, start=1):
+        try:
+            group_name = (record.get("group") or "").strip()
+            day_date = parse_day_date(record.get("date"))
+            if not group_name or day_date is None:
+                raise InvalidRecord("нет группы или даты")
+            start_minute, end_minute = parse_lesson_time(record.get("time"))
+            teacher = clean_teacher_name(record.get("teacher"))
+            yield {
+                "group": group_name,
+                "day_date": day_date,
+                "time": (record.get("time") or "").strip(),
+                "start_minute": start_minute,
+                "end_minute": end_minute,
+                "subject": (record.get("subject") or "").strip(),
+                "type": (record.get("type") or "").strip(),
+                "classroom": (record.get("classroom") or "").strip() or None,
+                "teacher": teacher,
+                "teacher_key": canonical_teacher_name(teacher),
+            }
+        except (InvalidRecord, AttributeError, TypeError) as e:
+            logger.warning(f"⚠️ Запись {number} пропущена: {e}")
+
+
+def lesson_signature(r: dict) -> tuple:
+    """Поля пары, изменение которых меняет расписание дня"""
+    return (r["time"], r["subject"], r["type"], r["classroom"] or "", r["teacher_key"] or "")
+
+
+def day_fingerprint(signatures: list) -> str:
+    """Отпечаток дня не зависит от порядка пар в файле"""
+    digest = hashlib.blake2b(digest_size=16)
+    for signature in sorted(signatures):
+        digest.update("\x1f".join(signature).encode())
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class ImportStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.lessons = 0
+        self.days = 0
+        self.groups = 0
+        self.teachers = 0
+        self.replaced_days = 0
+        self.unchanged_days = 0
+        self.updated_days = 0
+        self.deleted_days = 0
+        self.affected_groups: set[int] = set()
+        self.affected_teachers: set[str] = set()  # Канонические ФИО
+        self.changed_dates: set[tuple[str, date]] = set()  # (группа, дата) изменённых дней
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.lessons / self.seconds if self.seconds > 0 else 0.0
+
+    def changes(self) -> dict:
+        """Что реально изменилось - для кеша и уведомлений"""
+        return {
+            "groups": sorted({name for name, _ in self.changed_dates}),
+            "teachers": sorted(self.affected_teachers),
+            "dates": sorted({day_date.isoformat() for _, day_date in self.changed_dates}),
+            "days": [{"group": name, "date": day_date.isoformat()} for name, day_date in sorted(self.changed_dates)],
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "lessons": self.lessons,
+            "days": self.days,
+            "replaced_days": self.replaced_days,
+            "unchanged_days": self.unchanged_days,
+            "updated_days": self.updated_days,
+            "deleted_days": self.deleted_days,
+            "groups": self.groups,
+            "teachers": self.teachers,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows_per_second),
+        }
+
+
+class BulkImporter:
+    """Пишет пачки нормализованных записей; день из файла целиком заменяет такой же день в БД"""
+
+    def __init__(self, conn: Connection, stats: ImportStats | None = None):
+        self.conn = conn
+        self.stats = stats or ImportStats()
+        self.group_ids = {name: id_ for id_, name in conn.execute(select(groups_table.c.id, groups_table.c.name))}
+        self.teacher_ids = {
+            key: id_ for id_, key in conn.execute(select(teachers_table.c.id, teachers_table.c.canonical_name))
+        }
+        # (group_id, day_date) -> id дня, созданного этим импортом
+        self.day_ids: dict[tuple[int, date], int] = {}
+        # (group_id, day_date) -> подписи пар для days.fingerprint
+        self.day_signatures: dict[tuple[int, date], list] = {}
+
+    def _ensure_groups(self, batch: list):
+        missing = sorted({r["group"] for r in batch} - self.group_ids.keys())
+        if not missing:
+            return
+        self.conn.execute(groups_table.insert(), [{"name": name} for name in missing])
+        rows = self.conn.execute(select(groups_table.c.id, groups_table.c.name).where(groups_table.c.name.in_(missing)))
+        self.group_ids.update({name: id_ for id_, name in rows})
+        self.stats.groups += len(missing)
+
+    def _ensure_teachers(self, batch: list):
+        names = {}
+        for r in batch:
+            if r["teacher_key"] and r["teacher_key"] not in self.teacher_ids:
+                names.setdefault(r["teacher_key"], r["teacher"])
+        if not names:
+            return
+        self.conn.execute(teachers_table.insert(), [{"name": name, "canonical_name": key} for key, name in names.items()])
+        rows = self.conn.execute(
+            select(teachers_table.c.id, teachers_table.c.canonical_name).where(teachers_table.c.canonical_name.in_(list(names)))
+        )
+        self.teacher_ids.update({key: id_ for id_, key in rows})
+        self.stats.teachers += len(names)
+
+    def _replace_days(self, keys: list[tuple[int, date]]):
+        """Старые версии дней из файла удаляем вместе с парами (их преподаватели тоже теряют актуальность)"""
+        old_days = self.conn.execute(
+            select(days_table.c.id).where(tuple_(days_table.c.group_id, days_table.c.day_date).in_(keys))
+        ).scalars().all()
+        if not old_days:
+            return
+        for teacher in self.conn.execute(
+            select(lessons_table.c.teacher).where(lessons_table.c.day_id.in_(old_days)).distinct()
+        ).scalars():
+            if canonical_teacher_name(teacher):
+                self.stats.affected_teachers.add(canonical_teacher_name(teacher))
+        self.conn.execute(delete(lessons_table).where(lessons_table.c.day_id.in_(old_days)))
+        self.conn.execute(delete(days_table).where(days_table.c.id.in_(old_days)))
+        self.stats.replaced_days += len(old_days)
+
+    def _ensure_days(self, batch: list):
+        new_keys = sorted({(self.group_ids[r["group"]], r["day_date"]) for r in batch} - self.day_ids.keys())
+        if not new_keys:
+            return
+        self._replace_days(new_keys)
+        self._insert_days([{"day_date": day_date, "group_id": group_id} for group_id, day_date in new_keys])
+        self.stats.days += len(new_keys)
+        self.stats.affected_groups.update(group_id for group_id, _ in new_keys)
+
+    def _insert_days(self, rows: list[dict]):
+        """Вставка дней с получением id: RETURNING там, где он есть для executemany (SQLite, PostgreSQL, MariaDB),
+        иначе (MySQL) - обычная вставка и повторный SELECT по (group_id, day_date)"""
+        insert = days_table.insert()
+        if self.conn.dialect.name == "sqlite":
+            # days.date фронтенд показывает как есть: в SQLite пишем ту же подпись, что у прежних записей
+            # ("Понедельник, 01.09.2025"); в PostgreSQL/MySQL колонка - настоящий DATE
+            insert = insert.values(date=bindparam("date_label", type_=String()))
+            rows = [{**r, "date_label": day_label(r["day_date"])} for r in rows]
+        else:
+            rows = [{**r, "date": r["day_date"]} for r in rows]
+        if self.conn.dialect.insert_executemany_returning:
+            inserted = self.conn.execute(
+                insert.returning(days_table.c.id, days_table.c.group_id, days_table.c.day_date), rows
+            )
+        else:
+            self.conn.execute(insert, rows)
+            inserted = self.conn.execute(
+                select(days_table.c.id, days_table.c.group_id, days_table.c.day_date).where(
+                    tuple_(days_table.c.group_id, days_table.c.day_date).in_([(r["group_id"], r["day_date"]) for r in rows])
+                )
+            )
+        self.day_ids.update({(group_id, day_date): id_ for id_, group_id, day_date in inserted})
+
+    def _lesson_row(self, r: dict, day_id: int) -> dict:
+        return {
+            "day_id": day_id,
+            "time": r["time"],
+            "start_minute": r["start_minute"],
+            "end_minute": r["end_minute"],
+            "subject": r["subject"],
+            "type": r["type"],
+            "classroom": r["classroom"],
+            "teacher": r["teacher"],
+            "teacher_id": self.teacher_ids.get(r["teacher_key"]),
+        }
+
+    def write_batch(self, batch: list):
+        self._ensure_groups(batch)
+        self._ensure_teachers(batch)
+        self._ensure_days(batch)
+        rows = []
+        for r in batch:
+            key = (self.group_ids[r["group"]], r["day_date"])
+            rows.append(self._lesson_row(r, self.day_ids[key]))
+            self.day_signatures.setdefault(key, []).append(lesson_signature(r))
+        self.conn.execute(lessons_table.insert(), rows)
+        self.stats.lessons += len(batch)
+        self.stats.affected_teachers.update(r["teacher_key"] for r in batch if r["teacher_key"])
+        self.stats.changed_dates.update((r["group"], r["day_date"]) for r in batch)
+
+    def _store_fingerprints(self):
+        # День может быть размазан по нескольким пачкам - отпечаток считаем в конце
+        if self.day_signatures:
+            self.conn.execute(
+                days_table.update().where(days_table.c.id == bindparam("_id")).values(fingerprint=bindparam("fingerprint")),
+                [
+                    {"_id": self.day_ids[key], "fingerprint": day_fingerprint(signatures)}
+                    for key, signatures in self.day_signatures.items()
+                ],
+            )
+
+    def run(self, records: Iterable[dict], batch_size: int = BATCH_SIZE, progress=None) -> ImportStats:
+        for batch in batched(normalize_records(records), batch_size):
+            self.write_batch(batch)
+            if progress:
+                progress(self.stats)
+        self._store_fingerprints()
+        return self.stats
+
+
+class IncrementalImporter(BulkImporter):
+    """Импорт только изменившихся дней.
+
+    Записи файла группируются по (группа, дата), отпечаток пар дня сравнивается с days.fingerprint:
+    совпал - день не трогаем, отличается - заменяем пары дня, нового дня нет в БД - вставляем.
+    Дни групп из файла в пределах его диапазона дат, которых в файле нет, удаляются.
+    Файл держится в памяти (семестр - сотни тысяч коротких записей)."""
+
+    def run(self, records: Iterable[dict], batch_size: int = BATCH_SIZE, progress=None) -> ImportStats:
+        by_day: dict[tuple[str, date], list] = {}
+        for r in normalize_records(records):
+            by_day.setdefault((r["group"], r["day_date"]), []).append(r)
+        if not by_day:
+            return self.stats
+
+        group_names = sorted({name for name, _ in by_day})
+        self._ensure_groups([{"group": name} for name in group_names])
+        bounds: dict[int, tuple[date, date]] = {}
+        for name, day_date in by_day:
+            group_id = self.group_ids[name]
+            low, high = bounds.get(group_id, (day_date, day_date))
+            bounds[group_id] = (min(low, day_date), max(high, day_date))
+
+        existing = {}
+        for id_, group_id, day_date, fingerprint in self.conn.execute(
+            select(days_table.c.id, days_table.c.group_id, days_table.c.day_date, days_table.c.fingerprint)
+            .where(days_table.c.group_id.in_(list(bounds)))
+            .where(days_table.c.day_date.between(min(b[0] for b in bounds.values()), max(b[1] for b in bounds.values())))
+        ):
+            low, high = bounds[group_id]
+            if low <= day_date <= high:
+                existing[(group_id, day_date)] = (id_, fingerprint)
+
+        new_days, changed_days, fingerprints = [], [], {}
+        for (name, day_date), day_records in by_day.items():
+            key = (self.group_ids[name], day_date)
+            fingerprint = day_fingerprint([lesson_signature(r) for r in day_records])
+            fingerprints[key] = fingerprint
+            if key not in existing:
+                new_days.append(key)
+            elif existing[key][1] != fingerprint:
+                changed_days.append(key)
+            else:
+                self.stats.unchanged_days += 1
+        deleted_days = [key for key in existing if key not in fingerprints]
+
+        # Преподаватели старых версий изменённых и удалённых дней тоже затронуты
+        stale_ids = [existing[key][0] for key in changed_days + deleted_days]
+        for ids in batched(stale_ids, batch_size):
+            for teacher in self.conn.execute(
+                select(lessons_table.c.teacher).where(lessons_table.c.day_id.in_(ids)).distinct()
+            ).scalars():
+                if canonical_teacher_name(teacher):
+                    self.stats.affected_teachers.add(canonical_teacher_name(teacher))
+            self.conn.execute(delete(lessons_table).where(lessons_table.c.day_id.in_(ids)))
+        deleted_ids = [existing[key][0] for key in deleted_days]
+        for ids in batched(deleted_ids, batch_size):
+            self.conn.execute(delete(days_table).where(days_table.c.id.in_(ids)))
+        if changed_days:
+            self.conn.execute(
+                days_table.update().where(days_table.c.id == bindparam("_id")).values(fingerprint=bindparam("fingerprint")),
+                [{"_id": existing[key][0], "fingerprint": fingerprints[key]} for key in changed_days],
+            )
+        self.day_ids.update({key: existing[key][0] for key in changed_days})
+        for keys in batched(sorted(new_days), batch_size):
+            self._insert_days([
+                {"day_date": day_date, "group_id": group_id, "fingerprint": fingerprints[(group_id, day_date)]}
+                for group_id, day_date in keys
+            ])
+
+        names = {group_id: name for name, group_id in self.group_ids.items()}
+        touched = changed_days + new_days
+        changed_records = [r for key in touched for r in by_day[(names[key[0]], key[1])]]
+        self._ensure_teachers(changed_records)
+        for batch in batched(changed_records, batch_size):
+            self.conn.execute(lessons_table.insert(), [
+                self._lesson_row(r, self.day_ids[(self.group_ids[r["group"]], r["day_date"])]) for r in batch
+            ])
+            self.stats.lessons += len(batch)
+            self.stats.affected_teachers.update(r["teacher_key"] for r in batch if r["teacher_key"])
+            if progress:
+                progress(self.stats)
+
+        self.stats.days += len(new_days)
+        self.stats.updated_days += len(changed_days)
+        self.stats.deleted_days += len(deleted_days)
+        for group_id, day_date in touched + deleted_days:
+            self.stats.affected_groups.add(group_id)
+            self.stats.changed_dates.add((names[group_id], day_date))
+        return self.stats
@@ -1,78 +1,27 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, date
 from ..models.schedule import Group, Day, Lesson, User
-from sqlalchemy import text
-import hashlib, hmac
-from urllib.parse import parse_qsl
+from sqlalchemy import text, bindparam, select, Date
 from ..core.config import settings
+from ..core.telegram_auth import authenticate
+from ..core.parsing import parse_iso_date, canonical_teacher_name
+from ..schemas.schedule import Day as DaySchema, TeacherDay as TeacherDaySchema
 
 class AuthHelpers:
-    @staticmethod
-    def _parse_user_payload(init_data: str) -> dict | None:
-        try:
-            data = dict(parse_qsl(
-                init_data,
-                keep_blank_values=True,
-                strict_parsing=False,
-                encoding='utf-8',
-                errors='ignore'
-            ))
-            # try parse user json
-            user = data.get('user')
-            if user:
-                import json
-                u = json.loads(user)
-                return {
-                    "user_id": int(u.get('id')) if u.get('id') is not None else None,
-                    "username": u.get('username'),
-                    "first_name": u.get('first_name'),
-                    "last_name": u.get('last_name'),
-                    "language_code": u.get('language_code')
-                }
-            if 'user_id' in data:
-                return {"user_id": int(data['user_id'])}
-        except Exception:
-            pass
-        return None
-
     @staticmethod
     def verify_init_data(init_data: str) -> dict | None:
+        # Разбор и HMAC - в общем кеше проверенных initData (тот же, что у auth-middleware)
+        auth = authenticate(init_data, "helpers")
         # В публичном режиме не проверяем HMAC, но пытаемся извлечь реальные данные пользователя
         if settings.ALLOW_PUBLIC:
-            if not init_data:
-                return {"user_id": "public"}
-            payload = AuthHelpers._parse_user_payload(init_data)
-            return payload or {"user_id": "public"}
+            return (auth.user if auth else None) or {"user_id": "public"}
 
         # Строгая проверка в обычном режиме
-        if not init_data or not settings.BOT_TOKEN:
-            return None
-        data = dict(parse_qsl(init_data, strict_parsing=True))
-        hash_ = data.pop('hash', None)
-        dcs = '\n'.join(f"{k}={v}" for k, v in sorted(data.items()))
-        secret = hashlib.sha256(settings.BOT_TOKEN.encode()).digest()
-        check = hmac.new(secret, dcs.encode(), hashlib.sha256).hexdigest()
-        if check != hash_:
+        if auth is None or not auth.verified:
             return None
-        # try parse user json
-        user = data.get('user')
-        try:
-            import json
-            if user:
-                u = json.loads(user)
-                return {
-                    "user_id": int(u.get('id')),
-                    "username": u.get('username'),
-                    "first_name": u.get('first_name'),
-                    "last_name": u.get('last_name'),
-                    "language_code": u.get('language_code')
-                }
-        except Exception:
-            pass
-        if 'user_id' in data:
-            return {"user_id": int(data['user_id'])}
-        return None
+        return auth.user
 
     @staticmethod
     def upsert_user(db: Session, payload: dict) -> User | None:
@@ -109,6 +58,178 @@ class AuthHelpers:
             user.last_selected_teacher = teacher
         db.commit()
 
+# --- SQL запросы расписания (общие для синхронного и асинхронного сервисов) ---
+# Равенство по индексу (group_id, day_date)
+GROUP_DAY_QUERY = text(
+    """
+    SELECT d.id, d.date, d.group_id, l.id as lesson_id, l.time, l.subject, l.type, l.classroom, l.teacher,
+           l.start_minute, l.end_minute
+    FROM days d
+    LEFT JOIN lessons l ON l.day_id = d.id
+    WHERE d.group_id = :group_id AND d.day_date = :day_date
+    ORDER BY l.start_minute ASC, l.time ASC
+    """
+).bindparams(bindparam("day_date", type_=Date))
+
+TEACHER_DAY_QUERY = text(
+    """
+    SELECT l.id, l.day_id, l.time, l.subject, l.type, l.classroom, t.name AS teacher, d.date, d.group_id,
+           l.start_minute, l.end_minute
+    FROM teachers t
+    JOIN lessons l ON l.teacher_id = t.id
+    JOIN days d ON l.day_id = d.id
+    WHERE t.canonical_name = :teacher_key AND d.day_date = :day_date
+    ORDER BY l.start_minute ASC, l.time ASC
+    """
+).bindparams(bindparam("day_date", type_=Date))
+
+# Интервал дат одним запросом (range scan по (group_id, day_date))
+GROUP_RANGE_QUERY = text(
+    """
+    SELECT d.id, d.date, d.group_id, d.day_date, l.id as lesson_id, l.time, l.subject, l.type, l.classroom, l.teacher,
+           l.start_minute, l.end_minute
+    FROM days d
+    LEFT JOIN lessons l ON l.day_id = d.id
+    WHERE d.group_id = :group_id AND d.day_date BETWEEN :date_from AND :date_to
+    ORDER BY d.day_date ASC, d.id ASC, l.start_minute ASC, l.time ASC
+    """
+).bindparams(
+    bindparam("date_from", type_=Date),
+    bindparam("date_to", type_=Date),
+).columns(day_date=Date)
+
+TEACHER_RANGE_QUERY = text(
+    """
+    SELECT l.id, l.day_id, l.time, l.subject, l.type, l.classroom, t.name AS teacher, d.date, d.group_id, d.day_date,
+           l.start_minute, l.end_minute
+    FROM teachers t
+    JOIN lessons l ON l.teacher_id = t.id
+    JOIN days d ON l.day_id = d.id
+    WHERE t.canonical_name = :teacher_key AND d.day_date BETWEEN :date_from AND :date_to
+    ORDER BY d.day_date ASC, l.start_minute ASC, l.time ASC
+    """
+).bindparams(
+    bindparam("date_from", type_=Date),
+    bindparam("date_to", type_=Date),
+).columns(day_date=Date)
+
+GROUPS_QUERY = text("SELECT id, name FROM groups")
+
+# Справочник преподавателей; EXISTS идёт по индексу lessons.teacher_id, а не сканом всех занятий
+TEACHERS_QUERY = text(
+    """
+    SELECT t.name
+    FROM teachers t
+    WHERE EXISTS (SELECT 1 FROM lessons l WHERE l.teacher_id = t.id)
+    ORDER BY t.name ASC
+    """
+)
+
+
+# Сборщики ответов: контракт схемы проверяется один раз здесь, при построении payload,
+# дальше готовые байты отдаются из кеша без повторной валидации.
+def _build_group_day(schedule_data, day_date: date) -> Optional[dict]:
+    if not schedule_data:
+        return None
+    return DaySchema.model_validate({
+        "id": schedule_data[0][0],
+        "date": schedule_data[0][1],
+        "group_id": schedule_data[0][2],
+        "day_date": day_date.isoformat(),
+        "lessons": [
+            {
+                "id": row[3],
+                "day_id": row[0],
+                "time": row[4],
+                "subject": row[5],
+                "type": row[6],
+                "classroom": row[7],
+                "teacher": row[8],
+                "start_minute": row[9],
+                "end_minute": row[10]
+            }
+            for row in schedule_data if row[3] is not None
+        ]
+    }).model_dump()
+
+
+def _build_teacher_day(lessons_data) -> Optional[dict]:
+    # ФИО берём из справочника: любое написание в URL даёт один и тот же payload
+    if not lessons_data:
+        return None
+    return TeacherDaySchema.model_validate({
+        "date": lessons_data[0][7],
+        "teacher": lessons_data[0][6],
+        "lessons": [
+            {
+                "id": row[0],
+                "day_id": row[1],
+                "time": row[2],
+                "subject": row[3],
+                "type": row[4],
+                "classroom": row[5],
+                "teacher": row[6],
+                "group_id": row[8],
+                "start_minute": row[9],
+                "end_minute": row[10]
+            }
+            for row in lessons_data
+        ]
+    }).model_dump()
+
+
+def _build_group_days(rows) -> list:
+    days = []
+    for row in rows:
+        if not days or days[-1]["id"] != row[0]:
+            days.append({
+                "id": row[0],
+                "date": row[1],
+                "group_id": row[2],
+                "day_date": row[3].isoformat() if row[3] else None,
+                "lessons": []
+            })
+        if row[4] is not None:
+            days[-1]["lessons"].append({
+                "id": row[4],
+                "day_id": row[0],
+                "time": row[5],
+                "subject": row[6],
+                "type": row[7],
+                "classroom": row[8],
+                "teacher": row[9],
+                "start_minute": row[10],
+                "end_minute": row[11]
+            })
+    return [DaySchema.model_validate(day).model_dump() for day in days]
+
+
+def _build_teacher_days(rows) -> list:
+    days = []
+    for row in rows:
+        day_date = row[9].isoformat() if row[9] else None
+        if not days or days[-1]["day_date"] != day_date:
+            days.append({
+                "date": row[7],
+                "day_date": day_date,
+                "teacher": row[6],
+                "lessons": []
+            })
+        days[-1]["lessons"].append({
+            "id": row[0],
+            "day_id": row[1],
+            "time": row[2],
+            "subject": row[3],
+            "type": row[4],
+            "classroom": row[5],
+            "teacher": row[6],
+            "group_id": row[8],
+            "start_minute": row[10],
+            "end_minute": row[11]
+        })
+    return [TeacherDaySchema.model_validate(day).model_dump() for day in days]
+
+
 class ScheduleService:
     @staticmethod
     def get_group_by_id(db: Session, group_id: int) -> Optional[Group]:
@@ -117,45 +238,13 @@ class ScheduleService:
     @staticmethod
     def get_schedule_by_date(db: Session, group_id: int, date: str) -> Optional[Day]:
         try:
-            # Прямой SQL запрос для получения дня и уроков
-            query = text(
-                """
-                SELECT d.id, d.date, d.group_id, l.id as lesson_id, l.time, l.subject, l.type, l.classroom, l.teacher
-                FROM days d
-                LEFT JOIN lessons l ON l.day_id = d.id
-                WHERE d.group_id = :group_id AND d.date LIKE :date
-                ORDER BY l.time ASC
-                """
-            )
-            # Преобразуем ISO YYYY-MM-DD в шаблон ДД.ММ.ГГГГ (часть строки)
-            try:
-                yyyy, mm, dd = date.split("-")
-                formatted_like = f"%{dd}.{mm}.{yyyy}%"
-            except Exception:
-                formatted_like = f"%{date}%"
-            result = db.execute(query, {"group_id": group_id, "date": formatted_like})
+            day_date = parse_iso_date(date)
+            if day_date is None:
+                return None
+            result = db.execute(GROUP_DAY_QUERY, {"group_id": group_id, "day_date": day_date})
             schedule_data = result.fetchall()
             print("Данные расписания:", schedule_data)  # Отладка
-
-            if schedule_data:
-                return {
-                    "id": schedule_data[0][0],
-                    "date": schedule_data[0][1],
-                    "group_id": schedule_data[0][2],
-                    "lessons": [
-                        {
-                            "id": row[3],
-                            "day_id": row[0],
-                            "time": row[4],
-                            "subject": row[5],
-                            "type": row[6],
-                            "classroom": row[7],
-                            "teacher": row[8]
-                        }
-                        for row in schedule_data if row[3] is not None
-                    ]
-                }
-            return None
+            return _build_group_day(schedule_data, day_date)
         except Exception as e:
             print(f"Ошибка получения расписания: {e}")
             return None
@@ -167,7 +256,7 @@ class ScheduleService:
     @staticmethod
     def get_all_groups(db: Session) -> List[Group]:
         # Простой запрос - только id и name групп
-        result = db.execute(text("SELECT id, name FROM groups"))
+        result = db.execute(GROUPS_QUERY)
         groups = [{"id": row[0], "name": row[1]} for row in result]
         print("Группы из БД:", groups)  # Отладка
         return groups
@@ -175,52 +264,33 @@ class ScheduleService:
     @staticmethod
     def get_all_teachers(db: Session) -> list:
         # Получаем уникальные имена преподавателей из lessons
-        result = db.execute(text("SELECT DISTINCT teacher FROM lessons WHERE teacher IS NOT NULL AND teacher != '' ORDER BY teacher ASC"))
+        result = db.execute(TEACHERS_QUERY)
         teachers = [{"name": row[0]} for row in result]
         return teachers
     
     @staticmethod
     def get_teacher_schedule_by_date(db: Session, teacher_name: str, date: str) -> Optional[dict]:
         try:
-            # Прямой SQL запрос для получения уроков преподавателя на дату
-            query = text(
-                """
-                SELECT l.id, l.day_id, l.time, l.subject, l.type, l.classroom, l.teacher, d.date, d.group_id
-                FROM lessons l
-                JOIN days d ON l.day_id = d.id
-                WHERE l.teacher = :teacher_name AND d.date LIKE :date
-                ORDER BY l.time ASC
-                """
-            )
-            try:
-                yyyy, mm, dd = date.split("-")
-                formatted_like = f"%{dd}.{mm}.{yyyy}%"
-            except Exception:
-                formatted_like = f"%{date}%"
-            result = db.execute(query, {"teacher_name": teacher_name, "date": formatted_like})
-            lessons_data = result.fetchall()
-            if lessons_data:
-                return {
-                    "date": lessons_data[0][7],
-                    "teacher": teacher_name,
-                    "lessons": [
-                        {
-                            "id": row[0],
-                            "day_id": row[1],
-                            "time": row[2],
-                            "subject": row[3],
-                            "type": row[4],
-                            "classroom": row[5],
-                            "teacher": row[6],
-                            "group_id": row[8]
-                        }
-                        for row in lessons_data
-                    ]
-                }
-            return None
+            day_date = parse_iso_date(date)
+            if day_date is None:
+                return None
+            result = db.execute(TEACHER_DAY_QUERY, {"teacher_key": canonical_teacher_name(teacher_name), "day_date": day_date})
+            return _build_teacher_day(result.fetchall())
         except Exception as e:
             print(f"Ошибка получения расписания преподавателя: {e}")
             return None
+
+    @staticmethod
+    def get_schedule_by_range(db: Session, group_id: int, date_from: date, date_to: date) -> list:
+        """Все дни группы в интервале [date_from, date_to] одним запросом"""
+        result = db.execute(GROUP_RANGE_QUERY, {"group_id": group_id, "date_from": date_from, "date_to": date_to})
+        return _build_group_days(result)
+
+    @staticmethod
+    def get_teacher_schedule_by_range(db: Session, teacher_name: str, date_from: date, date_to: date) -> list:
+        """Занятия преподавателя в интервале, сгруппированные по дням"""
+        result = db.execute(TEACHER_RANGE_QUERY, {"teacher_key": canonical_teacher_name(teacher_name), "date_from": date_from, "date_to": date_to})
+        return _build_teacher_days(result)
     
     def create_test_data(db: Session):
         # Создаем группу
@@ -257,4 +327,62 @@ class ScheduleService:
         for lesson in lessons:
             db.add(lesson)
         
-        db.commit() 
\ No newline at end of file
+        db.commit() 
+
+
+class AsyncScheduleService:
+    """То же, что ScheduleService, но поверх AsyncSession: запросы не блокируют event loop"""
+
+    @staticmethod
+    async def get_group_by_id(db: AsyncSession, group_id: int) -> Optional[Group]:
+        result = await db.execute(select(Group).where(Group.id == group_id))
+        return result.scalars().first()
+
+    @staticmethod
+    async def get_schedule_by_date(db: AsyncSession, group_id: int, date: str) -> Optional[dict]:
+        try:
+            day_date = parse_iso_date(date)
+            if day_date is None:
+                return None
+            result = await db.execute(GROUP_DAY_QUERY, {"group_id": group_id, "day_date": day_date})
+            return _build_group_day(result.fetchall(), day_date)
+        except Exception as e:
+            print(f"Ошибка получения расписания: {e}")
+            return None
+
+    @staticmethod
+    async def get_lessons_by_day_id(db: AsyncSession, day_id: int) -> List[Lesson]:
+        result = await db.execute(select(Lesson).where(Lesson.day_id == day_id))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_all_groups(db: AsyncSession) -> list:
+        result = await db.execute(GROUPS_QUERY)
+        return [{"id": row[0], "name": row[1]} for row in result]
+
+    @staticmethod
+    async def get_all_teachers(db: AsyncSession) -> list:
+        result = await db.execute(TEACHERS_QUERY)
+        return [{"name": row[0]} for row in result]
+
+    @staticmethod
+    async def get_teacher_schedule_by_date(db: AsyncSession, teacher_name: str, date: str) -> Optional[dict]:
+        try:
+            day_date = parse_iso_date(date)
+            if day_date is None:
+                return None
+            result = await db.execute(TEACHER_DAY_QUERY, {"teacher_key": canonical_teacher_name(teacher_name), "day_date": day_date})
+            return _build_teacher_day(result.fetchall())
+        except Exception as e:
+            print(f"Ошибка получения расписания преподавателя: {e}")
+            return None
+
+    @staticmethod
+    async def get_schedule_by_range(db: AsyncSession, group_id: int, date_from: date, date_to: date) -> list:
+        result = await db.execute(GROUP_RANGE_QUERY, {"group_id": group_id, "date_from": date_from, "date_to": date_to})
+        return _build_group_days(result)
+
+    @staticmethod
+    async def get_teacher_schedule_by_range(db: AsyncSession, teacher_name: str, date_from: date, date_to: date) -> list:
+        result = await db.execute(TEACHER_RANGE_QUERY, {"teacher_key": canonical_teacher_name(teacher_name), "date_from": date_from, "date_to": date_to})
+        return _build_teacher_days(result)
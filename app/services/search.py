@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from collections import Counter
+from difflib import SequenceMatcher
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.cache import get_schedule_version, IMPORTS_FIELD, UNKNOWN_VERSION
+from ..core.config import settings
+from ..core.parsing import canonical_teacher_name
+from .schedule import AsyncScheduleService
+
+logger = logging.getLogger("app")
+
+# Поиск групп и преподавателей для автодополнения: индекс в памяти процесса,
+# пересобирается при смене версии импорта, запросы к БД только на пересборке.
+
+MAX_SEARCH_RESULTS = 50
+# Минимальное сходство (SequenceMatcher.ratio) слова с запросом, чтобы считать его опечаткой
+FUZZY_THRESHOLD = 0.7
+# Сколько кандидатов по триграммам проверяем точной метрикой
+FUZZY_CANDIDATES = 50
+
+
+def normalize(value) -> str:
+    """Регистр, ё/е и пробелы - как у канонического ФИО"""
+    return canonical_teacher_name(value) or ""
+
+
+def trigrams(value: str) -> set[str]:
+    padded = f"  {value} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Префиксный поиск по отсортированным словам (bisect) + нечёткий: кандидаты по триграммам,
+    ранжирование по сходству с ближайшим словом"""
+
+    def __init__(self, groups: list, teachers: list):
+        self.entries = [{"type": "group", "id": g["id"], "name": g["name"]} for g in groups]
+        self.entries += [{"type": "teacher", "id": None, "name": t["name"]} for t in teachers]
+        self.keys = [normalize(entry["name"]) for entry in self.entries]
+
+        # Отсортированные полные названия и отдельно слова после первого:
+        # "ис-2" находит "ИС-21", "ив" - "Петров Иван ..." (после совпадений по началу названия)
+        self.names = sorted((key, idx) for idx, key in enumerate(self.keys))
+        self.words = sorted({(word, idx) for idx, key in enumerate(self.keys) for word in key.split(" ")[1:]})
+
+        self.trigrams = {}
+        for idx, key in enumerate(self.keys):
+            for gram in trigrams(key):
+                self.trigrams.setdefault(gram, []).append(idx)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, query: str, limit: int = 10) -> list:
+        query = normalize(query)
+        if not query:
+            return []
+        limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+
+        # Префиксные совпадения: bisect + не больше limit шагов по каждому списку
+        results = []
+        matched = set()
+        for keys in (self.names, self.words):
+            position = bisect_left(keys, (query, -1))
+            while position < len(keys) and len(results) < limit:
+                key, idx = keys[position]
+                if not key.startswith(query):
+                    break
+                if idx not in matched:
+                    matched.add(idx)
+                    results.append(idx)
+                position += 1
+        if len(results) >= limit or len(query) < 3:
+            return [self.entries[idx] for idx in results]
+
+        # Опечатки: кандидаты с общими триграммами, затем сходство с началом каждого слова
+        # Слишком частые триграммы ("  п", "ов ") почти не различают строки, но стоят дороже всего
+        postings = [self.trigrams[gram] for gram in trigrams(query) if gram in self.trigrams]
+        rare = [p for p in postings if len(p) <= max(100, len(self.entries) // 4)]
+        shared = Counter()
+        for posting in rare or postings:
+            for idx in posting:
+                if idx not in matched:
+                    shared[idx] += 1
+        scored = []
+        matcher = SequenceMatcher(autojunk=False)
+        matcher.set_seq2(query)
+        for idx, _ in shared.most_common(FUZZY_CANDIDATES):
+            score = 0.0
+            for word in self.keys[idx].split(" "):
+                for candidate in (word, word[:len(query)]):
+                    matcher.set_seq1(candidate)
+                    # quick_ratio - дешёвая верхняя оценка ratio, отсекает заведомо далёкие слова
+                    if matcher.quick_ratio() > max(score, FUZZY_THRESHOLD - 1e-9):
+                        score = max(score, matcher.ratio())
+            if score >= FUZZY_THRESHOLD:
+                scored.append((-score, self.keys[idx], idx))
+        scored.sort()
+        results += [idx for _, _, idx in scored[:limit - len(results)]]
+        return [self.entries[idx] for idx in results]
+
+
+_index: SearchIndex | None = None
+_index_version: str | None = None
+_index_built_at = 0.0
+_index_lock = asyncio.Lock()
+
+
+def _is_fresh(version: str) -> bool:
+    if _index is None:
+        return False
+    if version == UNKNOWN_VERSION:
+        # Без Redis о новых импортах не узнать - пересобираем по времени
+        return time.monotonic() - _index_built_at < settings.CACHE_L1_TTL
+    return version == _index_version
+
+
+async def get_search_index(db: AsyncSession) -> SearchIndex:
+    """Текущий индекс; после импорта (новая версия IMPORTS_FIELD) пересобирается один раз на процесс"""
+    global _index, _index_version, _index_built_at
+    version = await get_schedule_version(IMPORTS_FIELD)
+    if _is_fresh(version):
+        return _index
+    async with _index_lock:
+        if _is_fresh(version):
+            return _index
+        started = time.perf_counter()
+        groups = await AsyncScheduleService.get_all_groups(db)
+        teachers = await AsyncScheduleService.get_all_teachers(db)
+        _index = SearchIndex(groups, teachers)
+        _index_version = version
+        _index_built_at = time.monotonic()
+        logger.info(f"🔎 Поисковый индекс собран: {len(_index)} записей за {time.perf_counter() - started:.3f}s (версия {version})")
+    return _index
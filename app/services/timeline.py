@@ -0,0 +1,110 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import orjson
+
+from ..core.cache import LocalCache
+from ..core.config import settings
+from .cached_schedule import (
+    cached_group_day, cached_teacher_day, cached_group_range, cached_teacher_range,
+    group_day_tag, teacher_day_tag
+)
+
+# "Что сейчас и что дальше": по каждому дню один раз строим отсортированный массив
+# начал пар и дальше отвечаем bisect-ом. Ключ - версионированный ключ дня, поэтому
+# после импорта массив пересобирается вместе с кешем расписания.
+
+# На сколько дней вперёд ищем следующую пару, если сегодня пар больше нет
+LOOKAHEAD_DAYS = 7
+
+timeline_cache = LocalCache(max_items=settings.CACHE_L1_MAX_ITEMS, ttl=settings.CACHE_L1_TTL)
+
+
+def local_now() -> datetime:
+    """Текущее время в часовом поясе расписания"""
+    if settings.TIMEZONE:
+        return datetime.now(ZoneInfo(settings.TIMEZONE)).replace(tzinfo=None)
+    return datetime.now()
+
+
+class DayTimeline:
+    """Пары дня, отсортированные по start_minute; пары без разобранного времени пропускаем"""
+
+    def __init__(self, day: dict | None):
+        lessons = [l for l in (day or {}).get("lessons", []) if l.get("start_minute") is not None]
+        lessons.sort(key=lambda l: l["start_minute"])
+        self.lessons = lessons
+        self.starts = [l["start_minute"] for l in lessons]
+
+    def at(self, minute: int) -> tuple[dict | None, dict | None]:
+        """(текущая пара, следующая пара) на минуту дня"""
+        position = bisect_right(self.starts, minute)
+        current = None
+        if position > 0:
+            lesson = self.lessons[position - 1]
+            end = lesson.get("end_minute")
+            if end is not None and minute < end:
+                current = lesson
+        following = self.lessons[position] if position < len(self.lessons) else None
+        return current, following
+
+
+async def _timeline(tag, load_day) -> DayTimeline:
+    timeline = timeline_cache.get(tag.key)
+    if timeline is None:
+        body = await load_day()
+        timeline = DayTimeline(orjson.loads(body) if body is not None else None)
+        timeline_cache.set(tag.key, timeline)
+    return timeline
+
+
+async def _next_day_lesson(load_range, today) -> tuple[str | None, dict | None]:
+    """Первая пара ближайшего дня после сегодняшнего (неделя берётся из недельного кеша)"""
+    days = await load_range(today + timedelta(days=1), today + timedelta(days=LOOKAHEAD_DAYS))
+    for day in days:
+        timeline = DayTimeline(day)
+        if timeline.lessons:
+            return day.get("day_date"), timeline.lessons[0]
+    return None, None
+
+
+async def _now(tag, load_day, load_range, now: datetime) -> dict:
+    today = now.date()
+    minute = now.hour * 60 + now.minute
+    timeline = await _timeline(tag, load_day)
+    current, following = timeline.at(minute)
+    next_date = today.isoformat() if following else None
+    if following is None:
+        next_date, following = await _next_day_lesson(load_range, today)
+    return {
+        "date": today.isoformat(),
+        "minute": minute,
+        "current": current,
+        "next": following,
+        "next_date": next_date,
+    }
+
+
+async def group_now(group_id: int, now: datetime | None = None) -> dict:
+    now = now or local_now()
+    date_str = now.date().isoformat()
+    tag = await group_day_tag(group_id, date_str)
+    return await _now(
+        tag,
+        lambda: cached_group_day(group_id, date_str, tag),
+        lambda start, end: cached_group_range(group_id, start, end),
+        now,
+    )
+
+
+async def teacher_now(teacher_name: str, now: datetime | None = None) -> dict:
+    now = now or local_now()
+    date_str = now.date().isoformat()
+    tag = await teacher_day_tag(teacher_name, date_str)
+    return await _now(
+        tag,
+        lambda: cached_teacher_day(teacher_name, date_str, tag),
+        lambda start, end: cached_teacher_range(teacher_name, start, end),
+        now,
+    )
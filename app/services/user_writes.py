@@ -0,0 +1,200 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, DataError, ProgrammingError
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..core.config import settings
+from ..core.database import async_engine
+from ..models.schedule import User
+
+logger = logging.getLogger("app")
+
+# Отложенная запись пользователей (write-behind): открытие Mini App и выбор группы/преподавателя
+# только обновляют запись в памяти, а в БД всё уходит одним bulk upsert раз в USER_FLUSH_INTERVAL
+# секунд или по накоплении USER_FLUSH_MAX_USERS пользователей. Так запросы не встают в очередь
+# за блокировкой записи SQLite; несброшенные изменения накладываются на чтение (read-your-writes).
+
+PROFILE_FIELDS = ("username", "first_name", "last_name", "language_code")
+SELECTION_FIELDS = ("last_selected_group_id", "last_selected_teacher")
+
+_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert, "mysql": mysql.insert, "mariadb": mysql.insert}
+
+
+def upsert_statement(dialect_name: str, columns: tuple):
+    """INSERT ... ON CONFLICT (tg_user_id) DO UPDATE только переданных колонок"""
+    insert = _INSERTS[dialect_name](User.__table__)
+    updates = [c for c in columns if c != "tg_user_id"]
+    if dialect_name in ("mysql", "mariadb"):
+        return insert.on_duplicate_key_update({c: insert.inserted[c] for c in updates})
+    return insert.on_conflict_do_update(
+        index_elements=["tg_user_id"], set_={c: insert.excluded[c] for c in updates}
+    )
+
+
+# Ошибки, при которых виновата сама строка (тип/ограничение/привязка параметра), а не БД целиком:
+# такие строки откладываем в карантин. OperationalError (БД заблокирована/недоступна) сюда
+# не входит - при ней пачка возвращается в буфер и повторяется при следующем сбросе
+ROW_ERRORS = (IntegrityError, DataError, ProgrammingError, TypeError, ValueError)
+QUARANTINE_MAX = 100
+MAX_TEACHER_LENGTH = 255
+
+
+class UserWriteBuffer:
+    def __init__(self, engine: AsyncEngine, max_users: int, interval: float):
+        self.engine = engine
+        self.max_users = max_users
+        self.interval = interval
+        self.pending: dict[int, dict] = {}  # tg_user_id -> изменённые колонки
+        self.inflight: dict[int, dict] = {}  # Пачка, которая сейчас пишется; чтения видят её до коммита
+        self.quarantine: dict[int, dict] = {}  # Строки, отвергнутые БД (для разбора, в БД не повторяются)
+        self.stats = {"records": 0, "coalesced": 0, "flushes": 0, "flushed_users": 0, "errors": 0, "rejected": 0}
+        self._lock = asyncio.Lock()
+        self._full = asyncio.Event()
+        self._stopping = False
+
+    def _merge(self, user_id: int, values: dict):
+        self.stats["records"] += 1
+        if user_id in self.pending:
+            self.stats["coalesced"] += 1
+            self.pending[user_id].update(values)
+        else:
+            self.pending[user_id] = values
+            if len(self.pending) >= self.max_users:
+                self._full.set()
+
+    def _requeue(self, batch: dict):
+        # Более свежие изменения из pending важнее возвращаемых
+        for user_id, values in batch.items():
+            self.pending[user_id] = {**values, **self.pending.get(user_id, {})}
+
+    def touch(self, payload: dict):
+        """Вместо AuthHelpers.upsert_user: профиль и last_seen_at"""
+        user_id = payload.get("user_id")
+        if not isinstance(user_id, int) or isinstance(user_id, bool):
+            return  # public/anonymous/web_user в БД не пишем
+        values = {
+            field: payload[field] for field in PROFILE_FIELDS
+            if field in payload and (payload[field] is None or isinstance(payload[field], str))
+        }
+        values["last_seen_at"] = datetime.utcnow()
+        self._merge(user_id, values)
+
+    def save_selection(self, user_id, group_id: int | None = None, teacher: str | None = None):
+        """Вместо AuthHelpers.save_last_selection; None и значения неверного типа прежний выбор не затирают"""
+        if not isinstance(user_id, int) or isinstance(user_id, bool):
+            return
+        values = {}
+        if isinstance(group_id, str) and group_id.strip().isdigit():
+            group_id = int(group_id)
+        if isinstance(group_id, int) and not isinstance(group_id, bool):
+            values["last_selected_group_id"] = group_id
+        elif group_id is not None:
+            logger.warning(f"⚠️ Некорректный group_id от пользователя {user_id}: {group_id!r}")
+        if isinstance(teacher, str) and len(teacher) <= MAX_TEACHER_LENGTH:
+            values["last_selected_teacher"] = teacher
+        elif teacher is not None:
+            logger.warning(f"⚠️ Некорректный teacher от пользователя {user_id}: {str(teacher)[:50]!r}")
+        if values:
+            self._merge(user_id, values)
+
+    async def get_selection(self, db, user_id) -> dict:
+        """Сохранённый выбор с наложенными несброшенными и ещё не закоммиченными изменениями"""
+        row = (await db.execute(
+            select(User.last_selected_group_id, User.last_selected_teacher).where(User.tg_user_id == user_id)
+        )).first()
+        selection = dict(zip(SELECTION_FIELDS, row)) if row else dict.fromkeys(SELECTION_FIELDS)
+        for overlay in (self.inflight, self.pending):
+            values = overlay.get(user_id, {})
+            selection.update({field: values[field] for field in SELECTION_FIELDS if field in values})
+        return selection
+
+    async def _write(self, batch: dict):
+        now = datetime.utcnow()
+        groups: dict[tuple, list] = {}
+        for user_id, values in batch.items():
+            # Для новых пользователей нужны NOT NULL колонки; у существующих created_at не трогаем
+            row = {"tg_user_id": user_id, "last_seen_at": now, **values}
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+        async with self.engine.begin() as conn:
+            for columns, rows in groups.items():
+                await conn.execute(upsert_statement(conn.dialect.name, columns), rows)
+
+    async def _write_rows(self, batch: dict) -> int:
+        """Пачка не прошла: пишем по одной строке, отвергнутые БД строки - в карантин.
+        Ошибка не из-за строки (БД недоступна/заблокирована) - остаток возвращаем в буфер"""
+        written = 0
+        items = list(batch.items())
+        for position, (user_id, values) in enumerate(items):
+            try:
+                await self._write({user_id: values})
+            except ROW_ERRORS as e:
+                self.stats["rejected"] += 1
+                if len(self.quarantine) < QUARANTINE_MAX:
+                    self.quarantine[user_id] = values
+                logger.warning(f"⚠️ Обновление пользователя {user_id} отвергнуто БД и отложено: {e}")
+            except Exception:
+                self._requeue(dict(items[position:]))
+                raise
+            else:
+                written += 1
+        return written
+
+    async def flush(self) -> int:
+        """Один bulk upsert на набор колонок; при ошибке - построчно, чтобы плохая строка не блокировала остальные"""
+        async with self._lock:
+            self._full.clear()
+            if not self.pending:
+                return 0
+            batch, self.pending = self.pending, {}
+            self.inflight = batch
+            try:
+                try:
+                    await self._write(batch)
+                    written = len(batch)
+                except asyncio.CancelledError:
+                    # Отмена посреди коммита: пачку не теряем (повторный upsert тех же значений безвреден)
+                    self._requeue(batch)
+                    raise
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.warning(f"❌ Не удалось записать пользователей пачкой ({len(batch)} шт.): {e}")
+                    try:
+                        written = await self._write_rows(batch)
+                    except asyncio.CancelledError:
+                        self._requeue({k: v for k, v in batch.items() if k not in self.quarantine})
+                        raise
+                    except Exception as e:
+                        logger.warning(f"❌ БД недоступна для записи пользователей, повторим позже: {e}")
+                        return 0
+            finally:
+                self.inflight = {}
+            self.stats["flushes"] += 1
+            self.stats["flushed_users"] += written
+            return written
+
+    async def run(self):
+        """Фоновая задача: сброс по таймеру или по заполнению буфера, до вызова stop()"""
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+            if self._stopping:
+                return
+
+    def stop(self):
+        """Просим фоновую задачу закончить текущий сброс и выйти (не cancel: пачка в полёте не теряется)"""
+        self._stopping = True
+        self._full.set()
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "pending": len(self.pending), "inflight": len(self.inflight),
+                "quarantined": len(self.quarantine)}
+
+
+user_writes = UserWriteBuffer(async_engine, settings.USER_FLUSH_MAX_USERS, settings.USER_FLUSH_INTERVAL)
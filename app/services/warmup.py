@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.cache import get_import_generation
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from .cached_schedule import cached_group_day, cached_teacher_day, cached_group_range, cached_teacher_range
+from .timeline import local_now
+
+logger = logging.getLogger("app")
+
+# Сохранённый выбор пользователей - спрос, переживающий рестарты (api_stats живёт только в воркере)
+POPULAR_GROUPS_QUERY = text(
+    """
+    SELECT last_selected_group_id, COUNT(*) AS users
+    FROM users
+    WHERE last_selected_group_id IS NOT NULL
+    GROUP BY last_selected_group_id
+    ORDER BY users DESC
+    LIMIT :limit
+    """
+)
+
+POPULAR_TEACHERS_QUERY = text(
+    """
+    SELECT last_selected_teacher, COUNT(*) AS users
+    FROM users
+    WHERE last_selected_teacher IS NOT NULL AND last_selected_teacher != ''
+    GROUP BY last_selected_teacher
+    ORDER BY users DESC
+    LIMIT :limit
+    """
+)
+
+
+async def get_popular(db: AsyncSession, top_n: int, popular_groups: dict | None = None, popular_teachers: dict | None = None):
+    """Топ-N групп и преподавателей: выбор пользователей из БД + счётчики запросов процесса"""
+    groups = Counter()
+    teachers = Counter()
+    for row in await db.execute(POPULAR_GROUPS_QUERY, {"limit": top_n}):
+        groups[int(row[0])] += row[1]
+    for row in await db.execute(POPULAR_TEACHERS_QUERY, {"limit": top_n}):
+        teachers[row[0]] += row[1]
+    for group_id, count in (popular_groups or {}).items():
+        groups[int(group_id)] += count
+    for teacher_name, count in (popular_teachers or {}).items():
+        teachers[teacher_name] += count
+    return [g for g, _ in groups.most_common(top_n)], [t for t, _ in teachers.most_common(top_n)]
+
+
+async def warm_up_cache(top_n: int | None = None, popular_groups: dict | None = None, popular_teachers: dict | None = None) -> dict:
+    """Прогреваем сегодня, завтра и текущую неделю для популярных групп и преподавателей"""
+    top_n = top_n or settings.WARMUP_TOP_N
+    started = time.perf_counter()
+    # "Сегодня" по TIMEZONE расписания, как у /now: на сервере в UTC около полуночи дата другая
+    today = local_now().date()
+    days = [today.isoformat(), (today + timedelta(days=1)).isoformat()]
+    monday = today - timedelta(days=today.weekday())
+    sunday = monday + timedelta(days=6)
+
+    async with AsyncSessionLocal() as db:
+        groups, teachers = await get_popular(db, top_n, popular_groups, popular_teachers)
+    for group_id in groups:
+        for day in days:
+            await cached_group_day(group_id, day)
+        await cached_group_range(group_id, monday, sunday)
+    for teacher_name in teachers:
+        for day in days:
+            await cached_teacher_day(teacher_name, day)
+        await cached_teacher_range(teacher_name, monday, sunday)
+
+    result = {"groups": len(groups), "teachers": len(teachers), "seconds": round(time.perf_counter() - started, 3)}
+    logger.info(f"🔥 Кеш прогрет: {result}")
+    return result
+
+
+def next_daily_run(now: datetime) -> datetime:
+    """Ближайшее WARMUP_TIME после now"""
+    hour, minute = (int(part) for part in settings.WARMUP_TIME.split(":"))
+    run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run_at <= now:
+        run_at += timedelta(days=1)
+    return run_at
+
+
+async def warmup_loop(get_popularity=None):
+    """Фоновая задача: прогрев при старте, ежедневно в WARMUP_TIME и после каждого импорта"""
+    async def run():
+        popular_groups, popular_teachers = get_popularity() if get_popularity else (None, None)
+        try:
+            await warm_up_cache(popular_groups=popular_groups, popular_teachers=popular_teachers)
+        except Exception as e:
+            logger.warning(f"❌ Ошибка прогрева кеша: {e}")
+
+    last_generation = await get_import_generation()
+    await run()
+    next_run = next_daily_run(local_now())
+    while True:
+        await asyncio.sleep(settings.WARMUP_POLL_INTERVAL)
+        generation = await get_import_generation()
+        imported = generation is not None and generation != last_generation
+        if imported or local_now() >= next_run:
+            if generation is not None:
+                last_generation = generation
+            next_run = next_daily_run(local_now())
+            await run()
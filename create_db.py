@@ -1,10 +1,15 @@
 from app.core.database import Base, engine
 from app.models.schedule import Group, Day, Lesson
+from app.core.cache import bump_schedule_versions
+import asyncio
 
 def create_database():
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
     print("База данных создана успешно")
+    # Все закешированные расписания устарели
+    if not asyncio.run(bump_schedule_versions(everything=True)):
+        print("Внимание: версии расписаний в Redis не обновлены, кеш может отдавать устаревшие данные")
 
 if __name__ == "__main__":
     create_database()
\ No newline at end of file
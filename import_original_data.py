@@ -1,7 +1,9 @@
+import asyncio
 from datetime import datetime
 from sqlalchemy.orm import Session
 from app.core.database import SessionLocal
 from app.models.schedule import Group, Day, Lesson
+from app.core.cache import bump_schedule_versions
 
 def import_data():
     db = SessionLocal()
@@ -43,6 +45,11 @@ def import_data():
         
         db.commit()
         print("Оригинальные данные восстановлены успешно")
+
+        # Инвалидируем кеш только для затронутых группы и преподавателей
+        teachers = {lesson.teacher for lesson in db.query(Lesson).join(Day).filter(Day.group_id == group.id)}
+        if not asyncio.run(bump_schedule_versions(groups=[group.id], teachers=teachers)):
+            print("Внимание: версии расписаний в Redis не обновлены, кеш может отдавать устаревшие данные")
         
     except Exception as e:
         print(f"Ошибка при импорте данных: {e}")
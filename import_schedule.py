@@ -0,0 +1,54 @@
+import argparse
+import asyncio
+import json
+
+from app.core.database import engine
+from app.core.cache import bump_schedule_versions
+from app.services.importer import BulkImporter, IncrementalImporter, read_records, BATCH_SIZE
+
+
+def main():
+    # Импорт расписания из файла: python import_schedule.py schedule.csv --batch 5000
+    # Обновление: python import_schedule.py schedule.csv --incremental --changes-out changes.json
+    parser = argparse.ArgumentParser(description="Импорт расписания из CSV / JSON Lines (потоково) или JSON (документ целиком в памяти)")
+    parser.add_argument("path", help="Файл расписания: одна запись = одна пара (group, date, time, subject, type, classroom, teacher)")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="Строк в одной пачке executemany")
+    parser.add_argument("--incremental", action="store_true", help="Писать только дни, чей отпечаток отличается от сохранённого")
+    parser.add_argument("--changes-out", help="Куда сохранить JSON с изменившимися группами, преподавателями и датами")
+    args = parser.parse_args()
+
+    def progress(stats):
+        print(f"  ... {stats.lessons} пар, {stats.rows_per_second:.0f} строк/с", end="\r", flush=True)
+
+    # Одна транзакция: читатели видят либо старое расписание, либо новое целиком
+    with engine.begin() as conn:
+        importer_class = IncrementalImporter if args.incremental else BulkImporter
+        stats = importer_class(conn).run(read_records(args.path), batch_size=args.batch, progress=progress)
+
+    result = stats.as_dict()
+    print()
+    print(
+        f"Импортировано: пар {result['lessons']}, дней {result['days']} (заменено {result['replaced_days']}), "
+        f"новых групп {result['groups']}, новых преподавателей {result['teachers']} "
+        f"за {result['seconds']}s ({result['rows_per_second']} строк/с)"
+    )
+    if args.incremental:
+        print(
+            f"Дни: без изменений {result['unchanged_days']}, обновлено {result['updated_days']}, "
+            f"удалено {result['deleted_days']}"
+        )
+    if args.changes_out:
+        with open(args.changes_out, "w", encoding="utf-8") as f:
+            json.dump(stats.changes(), f, ensure_ascii=False, indent=2)
+
+    # Инвалидируем кеш только для затронутых групп и преподавателей
+    if not stats.affected_groups and not stats.affected_teachers:
+        return
+    if not asyncio.run(bump_schedule_versions(groups=stats.affected_groups, teachers=stats.affected_teachers)):
+        # Данные в БД уже новые, но кеш продолжит отдавать старые версии - пусть это видит cron/CI
+        print("Ошибка: версии расписаний в Redis не обновлены, кеш может отдавать устаревшие данные")
+        raise SystemExit(2)
+
+
+if __name__ == "__main__":
+    main()
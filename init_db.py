@@ -1,6 +1,8 @@
 from app.core.database import Base, engine, SessionLocal
 from app.models.schedule import Group, Day, Lesson
+from app.core.cache import bump_schedule_versions
 from datetime import datetime
+import asyncio
 
 def init_database():
     # Создаем таблицы
@@ -35,6 +37,8 @@ def init_database():
         
         db.commit()
         print("База данных успешно создана и заполнена")
+        if not asyncio.run(bump_schedule_versions(groups=[group.id], teachers=[lesson.teacher for lesson in lessons])):
+            print("Внимание: версии расписаний в Redis не обновлены, кеш может отдавать устаревшие данные")
         
     except Exception as e:
         print(f"Ошибка: {e}")
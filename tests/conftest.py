@@ -0,0 +1,101 @@
+import os
+os.environ.setdefault('ALLOW_PUBLIC', 'true')
+
+import hashlib
+import hmac
+import json
+from urllib.parse import urlencode
+
+import pytest
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_configure(config):
+    # Тестовая БД - во временном каталоге pytest, а не в репозитории и не в базе из окружения/.env.
+    # Движки создаются при импорте app.core.database, поэтому URL задаём до сбора тестов
+    db_dir = config._tmp_path_factory.mktemp("db")
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_dir / 'test_api.db'}"
+
+
+@pytest.fixture
+def signed_init_data():
+    """Фабрика initData, подписанной BOT_TOKEN как у Telegram Mini App"""
+    from app.core.config import settings
+
+    def make(user_id: int = 42, **extra) -> str:
+        fields = {"auth_date": "1700000000", "query_id": "AAE", "user": json.dumps({"id": user_id, "username": "student"}), **extra}
+        check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+        secret = hmac.new(b"WebAppData", settings.BOT_TOKEN.encode(), hashlib.sha256).digest()
+        fields["hash"] = hmac.new(secret, check_string.encode(), hashlib.sha256).hexdigest()
+        return urlencode(fields)
+    return make
+
+
+class FakeRedis:
+    """Минимальный Redis в памяти: хеш версий, строки L2 и блокировки SET NX"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.strings = {}
+
+    async def hmget(self, key, *fields):
+        values = self.hashes.get(key, {})
+        return [values.get(field) for field in fields]
+
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    async def get(self, key):
+        return self.strings.get(key)
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.strings:
+            return None
+        self.strings[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    async def setex(self, key, ttl, value):
+        self.strings[key] = value
+
+    async def delete(self, *keys):
+        return sum(self.strings.pop(key, None) is not None for key in keys)
+
+    async def exists(self, *keys):
+        return sum(key in self.strings for key in keys)
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def hincrby(self, key, field, amount):
+                self.calls.append((key, field, amount))
+
+            async def execute(self):
+                for key, field, amount in self.calls:
+                    values = redis.hashes.setdefault(key, {})
+                    values[field] = int(values.get(field, 0)) + amount
+
+        return Pipeline()
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """FakeRedis вместо redis_client (с новым breaker); L1 и кеш версий чистим до и после теста"""
+    import app.core.cache as cache_module
+    fake = FakeRedis()
+    monkeypatch.setattr(cache_module, "redis_client", fake)
+    monkeypatch.setattr(cache_module, "redis_breaker", cache_module.CircuitBreaker(3, 30))
+    cache_module.version_cache.clear()
+    cache_module.local_cache.clear()
+    yield fake
+    cache_module.version_cache.clear()
+    cache_module.local_cache.clear()
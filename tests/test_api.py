@@ -1,6 +1,5 @@
 import os
-# Use repo-local tmp dir to avoid permissions issues in CI
-os.environ['DATABASE_URL'] = 'sqlite:///./.tmp/test_api.db'
+# DATABASE_URL (файл во временном каталоге pytest) задаёт tests/conftest.py
 os.environ.setdefault('ALLOW_PUBLIC', 'true')
 os.environ.setdefault('RUN_BOT', 'false')
 
@@ -12,13 +11,6 @@ from app.services.schedule import ScheduleService
 
 
 def setup_module(module):
-    # Ensure tmp directory exists and reset DB file
-    os.makedirs('./.tmp', exist_ok=True)
-    try:
-        if os.path.exists('./.tmp/test_api.db'):
-            os.remove('./.tmp/test_api.db')
-    except Exception:
-        pass
     # Prepare fresh test DB and seed minimal data
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
@@ -68,4 +60,210 @@ def test_lessons_by_day_id():
 def test_secure_endpoint_ok_when_public():
     resp = client.post("/secure-endpoint")
     assert resp.status_code == 200
-    assert resp.json().get("status") == "ok" 
\ No newline at end of file
+    assert resp.json().get("status") == "ok" 
+
+def test_group_schedule_by_iso_date():
+    from datetime import datetime
+    db = SessionLocal()
+    try:
+        day = db.query(Day).first()
+        group_id = day.group_id
+    finally:
+        db.close()
+    today = datetime.now().date().isoformat()
+    resp = client.get(f"/groups/{group_id}/schedule/{today}")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["group_id"] == group_id
+    assert len(body["lessons"]) == 2
+
+    missing = client.get(f"/groups/{group_id}/schedule/2099-01-01")
+    assert missing.status_code == 404
+
+
+def test_group_schedule_range_returns_days_in_interval():
+    from datetime import datetime, timedelta
+    db = SessionLocal()
+    try:
+        group_id = db.query(Day).first().group_id
+    finally:
+        db.close()
+    today = datetime.now().date()
+    resp = client.get(
+        f"/groups/{group_id}/schedule",
+        params={"from": (today - timedelta(days=3)).isoformat(), "to": (today + timedelta(days=3)).isoformat()},
+    )
+    assert resp.status_code == 200
+    days = resp.json()
+    assert [d["day_date"] for d in days] == [today.isoformat()]
+    assert len(days[0]["lessons"]) == 2
+
+    teacher = client.get(
+        "/teachers/Иванов И.И./schedule",
+        params={"from": today.isoformat(), "to": today.isoformat()},
+    )
+    assert teacher.status_code == 200
+    assert [len(d["lessons"]) for d in teacher.json()] == [1]
+
+
+def test_schedule_range_rejects_bad_interval():
+    resp = client.get("/groups/1/schedule", params={"from": "2025-09-10", "to": "2025-09-01"})
+    assert resp.status_code == 400
+    resp = client.get("/groups/1/schedule", params={"from": "2025-01-01", "to": "2025-12-31"})
+    assert resp.status_code == 400
+
+
+def test_groups_etag_revalidation():
+    resp = client.get("/groups/")
+    assert resp.status_code == 200
+    etag = resp.headers["etag"]
+    assert "max-age" in resp.headers["cache-control"]
+
+    cached = client.get("/groups/", headers={"If-None-Match": f'W/"stale", {etag}'})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    changed = client.get("/groups/", headers={"If-None-Match": '"stale"'})
+    assert changed.status_code == 200
+
+
+def test_teacher_spelling_variants_share_one_teacher():
+    from datetime import datetime
+    teachers = client.get("/teachers/")
+    assert teachers.status_code == 200
+    assert {"name": "Иванов И.И."} in teachers.json()
+
+    today = datetime.now().date().isoformat()
+    resp = client.get(f"/teachers/иванов  И. И./schedule/{today}")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["teacher"] == "Иванов И.И."
+    assert len(body["lessons"]) == 1
+
+
+def test_search_endpoint():
+    resp = client.get("/search", params={"q": "ИВАНОВ"})
+    assert resp.status_code == 200
+    assert {"type": "teacher", "id": None, "name": "Иванов И.И."} in resp.json()
+    assert client.get("/search", params={"q": ""}).status_code == 422
+
+
+def test_group_now_returns_next_lesson():
+    db = SessionLocal()
+    try:
+        group_id = db.query(Day).first().group_id
+    finally:
+        db.close()
+    resp = client.get(f"/groups/{group_id}/now")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert set(body) == {"date", "minute", "current", "next", "next_date"}
+    for lesson in (body["current"], body["next"]):
+        if lesson is not None:
+            assert lesson["start_minute"] is not None
+
+
+def test_free_classrooms():
+    from datetime import datetime
+    today = datetime.now().date().isoformat()
+    busy = client.get("/classrooms/free", params={"date": today, "from": "09:30", "to": "10:00"})
+    assert busy.status_code == 200
+    free = client.get("/classrooms/free", params={"date": today, "from": "18:00", "to": "19:00"})
+    assert len(free.json()["classrooms"]) > len(busy.json()["classrooms"])
+    assert client.get("/classrooms/free", params={"from": "12:00", "to": "11:00"}).status_code == 400
+
+
+def test_server_timing_header_reports_db_queries():
+    resp = client.get("/test_db")
+    assert resp.status_code == 200
+    header = resp.headers["server-timing"]
+    assert 'db;dur=' in header and 'queries"' in header
+    assert "auth;dur=" in header and "total;dur=" in header
+
+    client.get("/groups/")
+    stats = client.get("/admin/stats").json()
+    assert "avg_db_queries" in stats["endpoints"]["get_groups"]
+    latency = stats["endpoints"]["get_groups"]["latency"]
+    assert latency["count"] >= 1 and latency["p50"] <= latency["p99"] <= latency["max"]
+    assert stats["latency"]["count"] >= latency["count"]
+
+
+def test_metrics_endpoint_exposes_endpoint_counters():
+    client.get("/groups/")
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert 'schedule_api_requests_total{endpoint="get_groups"}' in resp.text
+    assert "# TYPE schedule_api_request_duration_seconds histogram" in resp.text
+    assert client.get("/admin/stats").json()["fleet"]["requests"] >= 1
+
+
+def test_whoami_uses_init_data_from_middleware(signed_init_data):
+    resp = client.get("/whoami", headers={"X-Telegram-InitData": signed_init_data(user_id=777)})
+    assert resp.status_code == 200
+    assert resp.json()["user_id"] == 777
+
+
+def test_user_selection_is_visible_before_flush(signed_init_data):
+    from app.services.user_writes import user_writes
+    headers = {"X-Telegram-InitData": signed_init_data(user_id=9001)}
+    assert client.post("/user/selection", json={"group_id": 3, "teacher": "Иванов И.И."}, headers=headers).json() == {"ok": True}
+    assert 9001 in user_writes.pending
+    selection = client.get("/user/selection", headers=headers).json()
+    assert selection == {"last_selected_group_id": 3, "last_selected_teacher": "Иванов И.И."}
+
+
+def test_post_body_init_data_takes_priority_over_headers(signed_init_data):
+    headers = {"X-Telegram-InitData": signed_init_data(user_id=9003)}
+    body = {"initData": signed_init_data(user_id=9004), "group_id": 5}
+    assert client.post("/user/selection", json=body, headers=headers).json() == {"ok": True}
+
+    owner = {"X-Telegram-InitData": signed_init_data(user_id=9004)}
+    assert client.get("/user/selection", headers=owner).json()["last_selected_group_id"] == 5
+    assert client.get("/user/selection", headers=headers).json()["last_selected_group_id"] is None
+
+
+def test_cache_hit_does_not_open_db_session(signed_init_data):
+    from app.core.database import db_stats
+    headers = {"X-Telegram-InitData": signed_init_data(user_id=9002)}  # свой ключ лимитера
+    client.get("/groups/", headers=headers)
+    before = dict(db_stats)
+    resp = client.get("/groups/", headers=headers)
+    assert resp.status_code == 200
+    assert db_stats["requests_without_checkout"] == before["requests_without_checkout"] + 1
+    assert db_stats["sessions_opened"] == before["sessions_opened"]
+    assert db_stats["checkouts"] == before["checkouts"]
+    assert client.get("/admin/stats").json()["db"]["requests_without_checkout"] >= 1
+
+
+def test_group_day_is_served_as_cached_bytes(signed_init_data):
+    import orjson
+    from datetime import datetime
+    from app.schemas.schedule import Day as DaySchema
+    db = SessionLocal()
+    try:
+        group_id = db.query(Day).first().group_id
+    finally:
+        db.close()
+    headers = {"X-Telegram-InitData": signed_init_data(user_id=9005)}  # свой ключ лимитера
+    url = f"/groups/{group_id}/schedule/{datetime.now().date().isoformat()}"
+    first = client.get(url, headers=headers)
+    second = client.get(url, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["content-type"] == "application/json"
+    assert "db;" not in second.headers["server-timing"]  # готовые байты из кеша, без БД
+    # Байты без response_model-валидации всё равно соответствуют схеме
+    assert orjson.loads(second.content) == DaySchema.model_validate_json(second.content).model_dump(mode="json")
+
+
+def test_static_requests_skip_init_data_check(monkeypatch):
+    import app.main as main_module
+    calls = []
+    monkeypatch.setattr(main_module, "authenticate", lambda *a: calls.append(a))
+    client.get("/", headers={"X-Telegram-InitData": "hash=bad"})
+    client.get("/robots.txt", headers={"X-Telegram-InitData": "hash=bad"})
+    assert calls == []
+    client.get("/config-public", headers={"X-Telegram-InitData": "hash=bad"})
+    assert len(calls) == 1
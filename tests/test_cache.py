@@ -0,0 +1,269 @@
+import os
+os.environ.setdefault('ALLOW_PUBLIC', 'true')
+
+from app.core.cache import LocalCache
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache(max_items=2, ttl=60)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    assert cache.get("a") == b"1"  # "a" становится самым свежим
+    cache.set("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.get("c") == b"3"
+    assert len(cache) == 2
+
+
+def test_local_cache_expires_by_ttl(monkeypatch):
+    import app.core.cache as cache_module
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = LocalCache(max_items=10, ttl=60)
+    cache.set("short", b"x", ttl=5)
+    cache.set("capped", b"y", ttl=3600)  # TTL ограничен ttl самого кеша
+    now[0] += 6
+    assert cache.get("short") is None
+    assert cache.get("capped") == b"y"
+    now[0] += 60
+    assert cache.get("capped") is None
+
+
+def test_get_or_load_coalesces_concurrent_misses():
+    import asyncio
+    from app.core.cache import get_or_load, local_cache
+
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"lessons": []}
+
+    async def run():
+        return await asyncio.gather(*[get_or_load("test:singleflight", loader, 60) for _ in range(10)])
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        local_cache.delete("test:singleflight")
+    assert len(calls) == 1
+    assert all(r == b'{"lessons":[]}' for r in results)
+
+
+def test_circuit_breaker_opens_after_threshold_and_closes_on_success(monkeypatch):
+    import app.core.cache as cache_module
+    from app.core.cache import CircuitBreaker
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open and not breaker.allow()
+    now[0] += 31
+    assert breaker.allow()  # пробный запрос в half-open
+    assert not breaker.allow()
+    breaker.record_success()
+    assert not breaker.is_open and breaker.allow()
+
+
+def test_keyspace_and_prefix_parsing():
+    from app.core.cache import parse_keyspace, key_prefix
+    info = {"db0": {"keys": 1200, "expires": 1100, "avg_ttl": 5000}, "db1": {"keys": 3, "expires": 0}}
+    assert parse_keyspace(info) == {"db0": {"keys": 1200, "expires": 1100}, "db1": {"keys": 3, "expires": 0}}
+    assert key_prefix(b"group_schedule:12:r2.v1.3:2024-09-02") == "group_schedule"
+    assert key_prefix("schedule_versions") == "schedule_versions"
+
+
+def test_singleflight_cancelled_caller_does_not_cancel_other_waiters():
+    import asyncio
+    from app.core.cache import singleflight
+
+    async def loader():
+        await asyncio.sleep(0.05)
+        return "loaded"
+
+    async def run():
+        first = asyncio.create_task(singleflight("test:cancel", loader))
+        second = asyncio.create_task(singleflight("test:cancel", loader))
+        await asyncio.sleep(0.01)
+        first.cancel()  # например, клиент первого запроса отключился
+        return await second, first.cancelled()
+
+    assert asyncio.run(run()) == ("loaded", True)
+
+
+def test_redis_lock_error_loads_without_waiting(monkeypatch):
+    import asyncio
+    import time
+    import app.core.cache as cache_module
+
+    async def broken_redis(method, *args, **kwargs):
+        raise ConnectionError("redis down")
+
+    async def loader():
+        return {"lessons": []}
+
+    monkeypatch.setattr(cache_module, "redis_call", broken_redis)
+    started = time.monotonic()
+    try:
+        payload = asyncio.run(cache_module._load_with_redis_lock("test:lock_error", loader, 60))
+    finally:
+        cache_module.local_cache.delete("test:lock_error")
+    assert payload == b'{"lessons":[]}'
+    assert time.monotonic() - started < cache_module.settings.CACHE_LOCK_POLL_MS / 1000
+
+
+def test_lock_waiter_stops_when_owner_released_without_result(monkeypatch):
+    import asyncio
+    import app.core.cache as cache_module
+
+    async def fake_redis(method, *args, **kwargs):
+        return {"set": None, "exists": 0}[method]  # lock занят другим воркером, затем снят
+
+    async def no_cache(key):
+        return None
+
+    async def loader():
+        return None
+
+    monkeypatch.setattr(cache_module, "redis_call", fake_redis)
+    monkeypatch.setattr(cache_module, "get_cached_bytes", no_cache)
+    monkeypatch.setattr(cache_module.settings, "CACHE_LOCK_TIMEOUT_MS", 60000)
+    assert asyncio.run(asyncio.wait_for(cache_module._load_with_redis_lock("test:released", loader, 60), 5)) is None
+
+
+def test_version_bump_invalidates_only_affected_schedules(fake_redis):
+    import asyncio
+    import app.core.cache as cache_module
+    from app.services.cached_schedule import group_day_tag, teacher_day_tag
+
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return {"lessons": len(calls)}
+
+    async def run():
+        before = [await group_day_tag(1, "2024-09-02"), await group_day_tag(2, "2024-09-02"),
+                  await teacher_day_tag("Иванов И. И.", "2024-09-02")]
+        first = await cache_module.get_or_load(before[0].key, loader, 60)
+        assert await cache_module.get_or_load(before[0].key, loader, 60) == first
+
+        assert await cache_module.bump_schedule_versions(groups=[1], teachers=["иванов и.и."])
+        after = [await group_day_tag(1, "2024-09-02"), await group_day_tag(2, "2024-09-02"),
+                 await teacher_day_tag("Иванов И.И.", "2024-09-02")]
+        second = await cache_module.get_or_load(after[0].key, loader, 60)
+        return before, after, first, second
+
+    before, after, first, second = asyncio.run(run())
+    assert before[0].key != after[0].key and before[0].etag != after[0].etag
+    assert before[1].key == after[1].key  # другую группу импорт не затронул
+    assert before[2].key != after[2].key  # варианты написания ФИО делят одну версию
+    assert (first, second) == (b'{"lessons":1}', b'{"lessons":2}')
+    assert fake_redis.strings[before[0].key] == first  # версионированные записи идут и в L2
+
+
+def test_unknown_version_is_not_written_to_redis(fake_redis):
+    import asyncio
+    import app.core.cache as cache_module
+
+    async def loader():
+        return {"lessons": []}
+
+    payload = asyncio.run(cache_module.get_or_load("group_schedule:1:r2.vu:2024-09-02", loader, 60, l2=False))
+    assert payload == b'{"lessons":[]}'
+    assert fake_redis.strings == {}
+
+
+def test_serialize_payload_gives_final_utf8_bytes():
+    import json
+    from datetime import date
+    from app.core.cache import serialize_payload
+    data = {"teacher": "Иванов И.И.", "day_date": date(2025, 9, 1), "lessons": [{"start_minute": 540, "classroom": None}]}
+    payload = serialize_payload(data)
+    assert isinstance(payload, bytes)
+    assert "Иванов И.И.".encode() in payload  # без \u-экранирования
+    assert json.loads(payload) == json.loads(json.dumps(data, ensure_ascii=False, default=str))
+
+
+def test_day_builder_validates_schema_before_caching():
+    import pytest
+    from datetime import date
+    from pydantic import ValidationError
+    from app.services.schedule import _build_group_day
+    row = (1, "01.09.2025", 7, 10, "09:00 - 10:30", "Сети", "Лекция", "315", "Иванов И.И.", 540, 630)
+    day = _build_group_day([row], date(2025, 9, 1))
+    assert day["day_date"] == "2025-09-01" and day["lessons"][0]["start_minute"] == 540
+    with pytest.raises(ValidationError):
+        _build_group_day([(1, "01.09.2025", "не число", *row[3:])], date(2025, 9, 1))
+
+
+def test_cancelled_leader_does_not_close_session_of_running_load(tmp_path, monkeypatch, fake_redis):
+    import asyncio
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from app.core.database import create_async_db_engine, AsyncSession
+    from app.services import cached_schedule
+    from app.services.schedule import AsyncScheduleService
+
+    engine = create_async_db_engine(f"sqlite:///{tmp_path / 'leader.db'}")
+    monkeypatch.setattr(cached_schedule, "AsyncSessionLocal", async_sessionmaker(bind=engine, class_=AsyncSession))
+    started, release = asyncio.Event(), asyncio.Event()
+    calls = []
+
+    async def slow_groups(db):
+        calls.append(db)
+        started.set()
+        await release.wait()
+        # Сессия загрузки своя: отмена запроса-лидера её не закрывает
+        return [{"id": (await db.execute(text("SELECT 7"))).scalar(), "name": "ИС-21"}]
+
+    monkeypatch.setattr(AsyncScheduleService, "get_all_groups", staticmethod(slow_groups))
+
+    async def run():
+        try:
+            tag = await cached_schedule.groups_list_tag()
+            leader = asyncio.create_task(cached_schedule.cached_groups(tag))
+            await started.wait()
+            waiter = asyncio.create_task(cached_schedule.cached_groups(tag))
+            await asyncio.sleep(0)
+            leader.cancel()  # клиент лидера отключился
+            await asyncio.gather(leader, return_exceptions=True)
+            release.set()
+            return leader, await asyncio.wait_for(waiter, 5)
+        finally:
+            await engine.dispose()
+
+    leader, payload = asyncio.run(run())
+    assert leader.cancelled()
+    assert payload == '[{"id":7,"name":"ИС-21"}]'.encode()
+    assert len(calls) == 1
+
+
+def test_redis_stats_collected_once_without_touching_singleflight_stats(monkeypatch, fake_redis):
+    import asyncio
+    import app.core.cache as cache_module
+    calls = []
+
+    async def collect():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"status": "connected", "keys_count": 3}
+
+    monkeypatch.setattr(cache_module, "collect_redis_stats", collect)
+    cache_module.redis_stats_cache.clear()
+    before = dict(cache_module.cache_stats["singleflight"])
+
+    async def run():
+        return await asyncio.gather(*[cache_module.get_redis_stats() for _ in range(5)])
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        cache_module.redis_stats_cache.clear()
+    assert calls == [1]
+    assert all(r["keys_count"] == 3 for r in results)
+    assert cache_module.cache_stats["singleflight"] == before
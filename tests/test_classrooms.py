@@ -0,0 +1,19 @@
+import os
+os.environ.setdefault('ALLOW_PUBLIC', 'true')
+
+from app.services.classrooms import OccupancyIndex
+
+
+def test_occupancy_index_merges_intervals_and_finds_free_rooms():
+    index = OccupancyIndex([
+        ("101", 540, 630),
+        ("101", 600, 700),  # пересекается с предыдущей - сливаются в [540, 700)
+        ("102", 640, 730),
+        (" 103 ", 815, None),  # без конца - длительность по умолчанию
+    ])
+    assert index.rooms["101"] == ([540], [700])
+    rooms = ["101", "102", "103", "104"]
+    assert index.free_rooms(rooms, 480, 540) == rooms
+    assert index.free_rooms(rooms, 700, 730) == ["101", "103", "104"]
+    assert index.free_rooms(rooms, 900, 920) == ["101", "102", "104"]
+    assert index.free_rooms(rooms, 910, 960) == rooms
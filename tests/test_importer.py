@@ -0,0 +1,127 @@
+import os
+os.environ.setdefault('ALLOW_PUBLIC', 'true')
+
+from datetime import date
+
+from sqlalchemy import create_engine, text
+
+from app.core.database import Base
+from app.services.importer import BulkImporter
+
+RECORDS = [
+    {"group": "ИС-21", "date": "Понедельник, 01.09.2025", "time": "09:00 - 10:30", "subject": "Сети", "type": "Лекция", "classroom": "315", "teacher": "Иванов И. И."},
+    {"group": "ИС-21", "date": "01.09.2025", "time": "10:40 - 12:10", "subject": "Сети", "type": "Практика", "classroom": "316", "teacher": "иванов и.и."},
+    {"group": "ИС-22", "date": "2025-09-02", "time": "09:00 - 10:30", "subject": "Физика", "type": "Лекция", "classroom": "", "teacher": "Петров П.П."},
+    {"group": "", "date": "2025-09-02", "time": "09:00", "subject": "Битая запись"},
+]
+
+
+def test_bulk_importer_writes_and_replaces_days():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        stats = BulkImporter(conn).run(RECORDS, batch_size=2)
+    assert (stats.lessons, stats.days, stats.groups, stats.teachers) == (3, 2, 2, 2)
+    assert stats.affected_teachers == {"иванов и.и.", "петров п.п."}
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT g.name, d.day_date, l.start_minute, l.end_minute, l.classroom, t.name "
+            "FROM lessons l JOIN days d ON d.id = l.day_id JOIN groups g ON g.id = d.group_id "
+            "JOIN teachers t ON t.id = l.teacher_id ORDER BY l.id"
+        )).fetchall()
+    assert [tuple(r) for r in rows] == [
+        ("ИС-21", "2025-09-01", 540, 630, "315", "Иванов И.И."),
+        ("ИС-21", "2025-09-01", 640, 730, "316", "Иванов И.И."),
+        ("ИС-22", "2025-09-02", 540, 630, None, "Петров П.П."),
+    ]
+
+    with engine.connect() as conn:
+        labels = conn.execute(text("SELECT date FROM days ORDER BY day_date")).scalars().all()
+    assert labels == ["Понедельник, 01.09.2025", "Вторник, 02.09.2025"]  # как у прежних записей
+
+    # Повторный импорт дня заменяет его, а не дублирует
+    with engine.begin() as conn:
+        stats = BulkImporter(conn).run(RECORDS[:1])
+    assert (stats.days, stats.replaced_days, stats.groups) == (1, 1, 0)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM lessons")).scalar() == 2
+        assert conn.execute(text("SELECT COUNT(*) FROM days WHERE day_date = :d"), {"d": date(2025, 9, 1)}).scalar() == 1
+
+
+def test_incremental_import_touches_only_changed_days():
+    from app.services.importer import IncrementalImporter
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        BulkImporter(conn).run(RECORDS)
+
+    changed = [dict(r) for r in RECORDS[:3]]
+    changed[2]["classroom"] = "101"  # ИС-22, 02.09 - поменялась аудитория
+    changed.append({"group": "ИС-22", "date": "2025-09-03", "time": "09:00 - 10:30", "subject": "Химия", "type": "Лекция", "teacher": "Сидоров С.С."})
+    with engine.begin() as conn:
+        stats = IncrementalImporter(conn).run(changed)
+    assert (stats.unchanged_days, stats.updated_days, stats.days, stats.deleted_days) == (1, 1, 1, 0)
+    assert stats.lessons == 2
+    assert stats.changes()["days"] == [{"group": "ИС-22", "date": "2025-09-02"}, {"group": "ИС-22", "date": "2025-09-03"}]
+    assert stats.affected_teachers == {"петров п.п.", "сидоров с.с."}
+
+    # Повторный прогон того же файла ничего не меняет; день, пропавший из диапазона файла, удаляется
+    with engine.begin() as conn:
+        assert IncrementalImporter(conn).run(changed).changes()["days"] == []
+        stats = IncrementalImporter(conn).run([changed[2], changed[3]])
+    assert stats.deleted_days == 0
+    with engine.begin() as conn:
+        stats = IncrementalImporter(conn).run([changed[3], {**changed[2], "date": "2025-09-01"}])
+    assert (stats.deleted_days, stats.days) == (1, 1)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM lessons")).scalar() == 4
+
+
+def test_importer_without_insert_returning(monkeypatch):
+    # MySQL не умеет RETURNING: id дней берутся повторным SELECT по (group_id, day_date)
+    from app.services.importer import IncrementalImporter
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(engine.dialect, "insert_executemany_returning", False)
+    with engine.begin() as conn:
+        stats = BulkImporter(conn).run(RECORDS)
+        assert (stats.lessons, stats.days) == (3, 2)
+        changed = [dict(r) for r in RECORDS[:3]]
+        changed[2]["classroom"] = "101"
+        stats = IncrementalImporter(conn).run(changed)
+        assert (stats.updated_days, stats.lessons) == (1, 1)
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT d.day_date, l.classroom FROM lessons l JOIN days d ON d.id = l.day_id ORDER BY l.id"
+        )).fetchall()
+    assert [tuple(r) for r in rows] == [("2025-09-01", "315"), ("2025-09-01", "316"), ("2025-09-02", "101")]
+
+
+def test_orm_lessons_resolve_teachers_in_bulk():
+    # Скрипты импорта через ORM: один IN-запрос к справочнику на flush, а не SELECT/INSERT на пару
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from app.models.schedule import Day, Group, Lesson
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *a: statements.append(sql))
+
+    with Session(engine) as session:
+        day = Day(date=date(2025, 9, 1), group=Group(name="ИС-21"))
+        teachers = ["Иванов И. И.", "иванов и.и.", "Петров П.П.", None]
+        session.add_all([Lesson(day=day, time="09:00 - 10:30", subject=f"Пара {i}", teacher=teachers[i % 4]) for i in range(20)])
+        session.commit()
+        assert sum("FROM teachers" in sql for sql in statements) == 2  # поиск + id вставленных
+        assert sum("INSERT INTO teachers" in sql for sql in statements) == 1
+
+        lessons = session.query(Lesson).order_by(Lesson.id).all()
+        assert lessons[0].teacher_id == lessons[1].teacher_id != lessons[2].teacher_id
+        assert lessons[3].teacher_id is None
+
+        lessons[3].teacher = "Петров П. П."
+        statements.clear()
+        session.commit()
+        assert lessons[3].teacher_id == lessons[2].teacher_id
+        assert not any("teachers" in sql for sql in statements if "UPDATE lessons" not in sql)
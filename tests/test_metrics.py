@@ -0,0 +1,71 @@
+import os
+os.environ.setdefault('ALLOW_PUBLIC', 'true')
+
+import random
+
+from app.core.metrics import LatencyHistogram, EndpointLatency, RequestTimings
+
+
+def test_histogram_percentiles_within_bucket_error():
+    histogram = LatencyHistogram()
+    rng = random.Random(42)
+    samples = [rng.lognormvariate(-4, 1) for _ in range(10000)]
+    for value in samples:
+        histogram.record(value)
+    samples.sort()
+    for q in (50, 90, 99):
+        exact = samples[int(len(samples) * q / 100) - 1]
+        assert abs(histogram.percentile(q) - exact) / exact <= LatencyHistogram.GROWTH
+    assert histogram.percentile(100) == histogram.max == samples[-1]
+    assert histogram.count == len(samples)
+
+
+def test_histogram_memory_is_fixed_and_clamps_outliers():
+    histogram = LatencyHistogram()
+    buckets = len(histogram.counts)
+    for value in (0.0, 1e-9, 3600.0, 0.01):
+        histogram.record(value)
+    assert len(histogram.counts) == buckets
+    assert histogram.counts[0] == 2 and histogram.counts[-1] == 1
+    assert histogram.summary()["max"] == 3600.0
+    assert LatencyHistogram().summary()["p99"] == 0.0
+
+
+def test_endpoint_latency_split_by_cache_status():
+    latency = EndpointLatency()
+    latency.record(0.001, "hit")
+    latency.record(0.050, "miss")
+    latency.record(0.002, "unexpected")
+    summary = latency.summary()
+    assert summary["count"] == 3
+    assert set(summary["by_cache"]) == {"hit", "miss", "none"}
+    assert summary["by_cache"]["miss"]["max"] == 0.05
+
+
+def test_miss_wins_over_hit_within_request():
+    timings = RequestTimings()
+    timings.mark_cache("hit")
+    timings.mark_cache("miss")
+    timings.mark_cache("hit")
+    assert timings.cache_status == "miss"
+
+
+def test_fleet_metrics_render_prometheus_histogram():
+    from app.core.fleet_metrics import FleetMetrics, render_prometheus, fleet_summary
+
+    metrics = FleetMetrics()
+    metrics.record_request("get_groups", 0.003, "hit")
+    metrics.record_request("get_groups", 0.2, "miss", db_queries=2, db_seconds=0.15)
+    metrics.record_request("get_groups", 30.0, error=True)
+    text = render_prometheus(metrics.totals)
+
+    assert 'schedule_api_requests_total{endpoint="get_groups"} 3' in text
+    assert 'schedule_api_errors_total{endpoint="get_groups"} 1' in text
+    assert 'schedule_api_cache_requests_total{endpoint="get_groups",cache="hit"} 1' in text
+    assert 'schedule_api_db_queries_total{endpoint="get_groups"} 2' in text
+    # Корзины накопительные, +Inf равна count
+    assert 'schedule_api_request_duration_seconds_bucket{endpoint="get_groups",le="0.005"} 1' in text
+    assert 'schedule_api_request_duration_seconds_bucket{endpoint="get_groups",le="0.25"} 2' in text
+    assert 'schedule_api_request_duration_seconds_bucket{endpoint="get_groups",le="+Inf"} 3' in text
+    assert 'schedule_api_request_duration_seconds_count{endpoint="get_groups"} 3' in text
+    assert fleet_summary(metrics.totals) == {"requests": 3, "errors": 1}
@@ -0,0 +1,57 @@
+import os
+os.environ.setdefault('ALLOW_PUBLIC', 'true')
+
+from sqlalchemy import create_engine, text
+
+from app.core.database import Base
+from app.services.importer import BulkImporter
+from migrate_db import migrate_data, copy_table, load_checkpoint, verify, row_digest
+
+
+def make_source(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    records = [
+        {"group": f"ИС-{g}", "date": f"2025-09-{d:02d}", "time": "09:00 - 10:30", "subject": "Сети", "type": "Лекция",
+         "classroom": str(100 + d), "teacher": f"Преподаватель{d % 3} И.И."}
+        for g in range(3) for d in range(1, 11)
+    ]
+    with engine.begin() as conn:
+        BulkImporter(conn).run(records)
+    return engine
+
+
+def test_migration_resumes_and_verifies(tmp_path):
+    source = make_source(tmp_path / "source.db")
+    target_url = f"sqlite:///{tmp_path / 'target.db'}"
+    target = create_engine(target_url)
+    Base.metadata.create_all(bind=target)
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+
+    # "Упали" после части таблиц: groups перенесена, чекпоинт потерян - дублей быть не должно
+    checkpoint = {}
+    assert copy_table(source, target, "groups", checkpoint, checkpoint_path, chunk_size=2) == 3
+    assert load_checkpoint(checkpoint_path)["groups"] == 3
+    os.remove(checkpoint_path)
+
+    assert migrate_data(f"sqlite:///{tmp_path / 'source.db'}", target_url, chunk_size=7, checkpoint_path=checkpoint_path)
+    assert not os.path.exists(checkpoint_path)
+    with target.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM lessons")).scalar() == 30
+        assert conn.execute(text("SELECT COUNT(*) FROM groups")).scalar() == 3
+
+    with target.begin() as conn:
+        conn.execute(text("UPDATE lessons SET classroom = '999' WHERE id = 1"))
+    assert not verify(source, target, ["groups", "lessons"])
+
+
+def test_row_digest_ignores_driver_representation():
+    from datetime import datetime
+    from decimal import Decimal
+    # SQLite: текст с микросекундами, bool как 1; MySQL: datetime без долей секунды, Decimal
+    sqlite_row = (1, "2025-09-01 10:00:00.654321", 1, 1.5, "ИС-21")
+    mysql_row = (1, datetime(2025, 9, 1, 10, 0, 0), True, Decimal("1.50"), "ИС-21")
+    assert row_digest(sqlite_row) == row_digest(mysql_row)
+    assert row_digest((2.0, None)) == row_digest((2, None))
+    assert row_digest((1, None)) != row_digest((1, ""))
+    assert row_digest(mysql_row) != row_digest((1, datetime(2025, 9, 1, 10, 0, 1), True, Decimal("1.5"), "ИС-21"))
@@ -0,0 +1,27 @@
+import os
+os.environ.setdefault('ALLOW_PUBLIC', 'true')
+
+from app.services.search import SearchIndex
+
+
+def make_index():
+    return SearchIndex(
+        groups=[{"id": 1, "name": "ИС-21"}, {"id": 2, "name": "ИС-22"}, {"id": 3, "name": "ЭК-11"}],
+        teachers=[{"name": "Фёдоров Фёдор Фёдорович"}, {"name": "Иванов И.И."}, {"name": "Петров П.П."}],
+    )
+
+
+def test_prefix_search_is_case_and_yo_insensitive():
+    index = make_index()
+    assert [r["name"] for r in index.search("ис-2")] == ["ИС-21", "ИС-22"]
+    assert [r["name"] for r in index.search("федор")] == ["Фёдоров Фёдор Фёдорович"]
+    # Префикс любого слова: отчество, инициалы
+    assert [r["name"] for r in index.search("ФЕДОРОВИЧ")] == ["Фёдоров Фёдор Фёдорович"]
+    assert index.search("ис", limit=1) == [{"type": "group", "id": 1, "name": "ИС-21"}]
+
+
+def test_fuzzy_search_tolerates_typos():
+    index = make_index()
+    assert index.search("Ивонов")[0]["name"] == "Иванов И.И."
+    assert index.search("Петорв")[0]["name"] == "Петров П.П."
+    assert index.search("zzz") == []
@@ -0,0 +1,66 @@
+import os
+os.environ.setdefault('ALLOW_PUBLIC', 'true')
+
+import hashlib
+import hmac
+import json
+from urllib.parse import urlencode
+
+from app.core import telegram_auth
+from app.core.config import settings
+
+
+def test_signed_init_data_is_verified_once(monkeypatch, signed_init_data):
+    telegram_auth.auth_cache.clear()
+    calls = []
+    original = telegram_auth.check_signature
+    monkeypatch.setattr(telegram_auth, "check_signature", lambda *a: calls.append(1) or original(*a))
+
+    init_data = signed_init_data()
+    first = telegram_auth.authenticate(init_data, "hdr.test")
+    second = telegram_auth.authenticate(f'"{init_data}"', "hdr.test")  # кавычки отбрасываются
+    assert first.verified and first.user["user_id"] == 42
+    assert second is first
+    assert len(calls) == 1
+
+
+def test_tampered_init_data_is_not_verified(signed_init_data):
+    telegram_auth.auth_cache.clear()
+    tampered = signed_init_data().replace("student", "admin")
+    auth = telegram_auth.authenticate(tampered, "hdr.test")
+    assert not auth.verified
+    assert auth.user["username"] == "admin"
+    assert telegram_auth.auth_cache.get(tampered) is None  # непроверенные строки не кешируются
+    assert telegram_auth.authenticate("", "none") is None
+
+
+def test_find_init_data_prefers_headers_over_query():
+    assert telegram_auth.find_init_data({"x-telegram-initdata": "a"}, {"tgWebAppData": "b"}) == ("a", "hdr.x-telegram-initdata")
+    assert telegram_auth.find_init_data({}, {"tgWebAppData": "b"}) == ("b", "qry.tgWebAppData")
+    assert telegram_auth.find_init_data({}, {}) == (None, "none")
+
+
+def test_legacy_sha256_token_signature_is_rejected():
+    telegram_auth.auth_cache.clear()
+    fields = {"auth_date": "1700000000", "user": json.dumps({"id": 5})}
+    check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    fields["hash"] = hmac.new(hashlib.sha256(settings.BOT_TOKEN.encode()).digest(), check_string.encode(), hashlib.sha256).hexdigest()
+    assert not telegram_auth.authenticate(urlencode(fields), "hdr.test").verified
+
+
+def test_bad_init_data_is_logged_quietly(caplog, signed_init_data):
+    import logging
+    telegram_auth.auth_cache.clear()
+    tampered = signed_init_data().replace("student", "admin")
+    with caplog.at_level(logging.DEBUG, logger="app"):
+        for _ in range(3):
+            assert not telegram_auth.authenticate(tampered, "hdr.test").verified
+    assert [r.levelno for r in caplog.records] == [logging.DEBUG] * 3
+
+
+def test_only_api_paths_are_authenticated():
+    assert telegram_auth.is_api_path("/groups/")
+    assert telegram_auth.is_api_path("/user/selection")
+    assert not telegram_auth.is_api_path("/")
+    assert not telegram_auth.is_api_path("/static/js/app.js")
+    assert not telegram_auth.is_api_path("/robots.txt")
@@ -0,0 +1,29 @@
+import os
+os.environ.setdefault('ALLOW_PUBLIC', 'true')
+
+from app.core.parsing import parse_lesson_time
+from app.services.timeline import DayTimeline
+
+
+def test_parse_lesson_time():
+    assert parse_lesson_time("13:35                - 15:10") == (815, 910)
+    assert parse_lesson_time("9.00-10.30") == (540, 630)
+    assert parse_lesson_time("12:00") == (720, None)
+    assert parse_lesson_time("по расписанию") == (None, None)
+    assert parse_lesson_time(None) == (None, None)
+
+
+def test_day_timeline_current_and_next():
+    timeline = DayTimeline({"lessons": [
+        {"id": 2, "start_minute": 640, "end_minute": 730},
+        {"id": 1, "start_minute": 540, "end_minute": 630},
+        {"id": 3, "start_minute": None, "end_minute": None},
+    ]})
+    assert timeline.at(500) == (None, {"id": 1, "start_minute": 540, "end_minute": 630})
+    current, following = timeline.at(600)
+    assert (current["id"], following["id"]) == (1, 2)
+    current, following = timeline.at(635)  # перемена
+    assert (current, following["id"]) == (None, 2)
+    current, following = timeline.at(700)
+    assert (current["id"], following) == (2, None)
+    assert DayTimeline(None).at(600) == (None, None)
@@ -0,0 +1,95 @@
+import os
+os.environ.setdefault('ALLOW_PUBLIC', 'true')
+
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import Base, create_async_db_engine
+from app.models.schedule import User
+from app.services.user_writes import UserWriteBuffer
+
+
+def test_updates_coalesce_into_one_upsert(tmp_path):
+    async def scenario():
+        engine = create_async_db_engine(f"sqlite:///{tmp_path / 'users.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        buffer = UserWriteBuffer(engine, max_users=2, interval=60)
+
+        buffer.touch({"user_id": 1, "username": "old"})
+        buffer.touch({"user_id": 1, "username": "new"})
+        buffer.save_selection(1, group_id=5)
+        buffer.touch({"user_id": "anonymous"})
+        assert len(buffer.pending) == 1 and buffer.stats["coalesced"] == 2
+        buffer.touch({"user_id": 2, "username": "second"})
+        assert buffer._full.is_set()  # буфер заполнен - фоновая задача сбросит не дожидаясь таймера
+        assert await buffer.flush() == 2
+
+        # Повторный сброс обновляет только переданные колонки
+        buffer.save_selection(1, teacher="Петров П.П.")
+        await buffer.flush()
+        async with engine.connect() as conn:
+            rows = {r.tg_user_id: r for r in await conn.execute(select(User))}
+        await engine.dispose()
+        return rows, buffer.get_stats()
+
+    rows, stats = asyncio.run(scenario())
+    assert rows[1].username == "new"
+    assert rows[1].last_selected_group_id == 5
+    assert rows[1].last_selected_teacher == "Петров П.П."
+    assert rows[1].created_at is not None
+    assert rows[2].username == "second"
+    assert stats["pending"] == 0 and stats["flushes"] == 2
+
+
+def test_flush_keeps_inflight_visible_and_survives_cancel_and_bad_rows(tmp_path):
+    async def scenario():
+        engine = create_async_db_engine(f"sqlite:///{tmp_path / 'users.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        buffer = UserWriteBuffer(engine, max_users=100, interval=60)
+
+        # Пока пачка пишется, выбор виден через inflight
+        buffer.save_selection(1, group_id=7)
+        started, release = asyncio.Event(), asyncio.Event()
+        original_write = buffer._write
+
+        async def slow_write(batch):
+            started.set()
+            await release.wait()
+            await original_write(batch)
+
+        buffer._write = slow_write
+        flush = asyncio.create_task(buffer.flush())
+        await started.wait()
+        async with AsyncSession(engine) as db:
+            assert (await buffer.get_selection(db, 1))["last_selected_group_id"] == 7
+        # Отмена посреди записи возвращает пачку в буфер
+        flush.cancel()
+        await asyncio.gather(flush, return_exceptions=True)
+        assert buffer.pending[1]["last_selected_group_id"] == 7 and not buffer.inflight
+        buffer._write = original_write
+
+        # Некорректные значения отбрасываются на входе, а строку, отвергнутую БД, - в карантин
+        buffer.save_selection(2, group_id="abc", teacher=["x"])
+        assert 2 not in buffer.pending
+        buffer.pending[3] = {"username": object()}
+        assert await buffer.flush() == 1
+        assert 3 in buffer.quarantine and not buffer.pending
+
+        # stop() даёт фоновой задаче дописать и выйти
+        buffer.save_selection(1, teacher="Петров П.П.")
+        task = asyncio.create_task(buffer.run())
+        buffer.stop()
+        await asyncio.wait_for(task, timeout=5)
+        async with engine.connect() as conn:
+            rows = {r.tg_user_id: r for r in await conn.execute(select(User))}
+        await engine.dispose()
+        return rows
+
+    rows = asyncio.run(scenario())
+    assert rows[1].last_selected_group_id == 7
+    assert rows[1].last_selected_teacher == "Петров П.П."
+    assert 3 not in rows
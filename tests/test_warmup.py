@@ -0,0 +1,136 @@
+import os
+os.environ.setdefault('ALLOW_PUBLIC', 'true')
+
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import app.core.cache as cache_module
+from app.core.database import Base, create_async_db_engine, AsyncSession
+from app.models.schedule import Group
+from app.services import cached_schedule, warmup
+from app.services.cached_schedule import group_day_tag
+from app.services.importer import BulkImporter
+
+
+def use_database(monkeypatch, url: str):
+    engine = create_async_db_engine(url)
+    factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(warmup, "AsyncSessionLocal", factory)
+    monkeypatch.setattr(cached_schedule, "AsyncSessionLocal", factory)
+    return engine
+
+
+def seed(path) -> int:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    today = datetime.now().date()
+    records = [
+        {"group": "ИС-21", "date": day.isoformat(), "time": "09:00 - 10:30", "subject": "Сети", "type": "Лекция", "teacher": "Иванов И.И."}
+        for day in (today, today + timedelta(days=1))
+    ]
+    with engine.begin() as conn:
+        BulkImporter(conn).run(records)
+        return conn.execute(select(Group.id)).scalar()
+
+
+def test_warmup_fills_local_cache_and_redis(tmp_path, monkeypatch, fake_redis):
+    group_id = seed(tmp_path / "warm.db")
+    engine = use_database(monkeypatch, f"sqlite:///{tmp_path / 'warm.db'}")
+    today = datetime.now().date()
+
+    async def run():
+        try:
+            result = await warmup.warm_up_cache(top_n=5, popular_groups={group_id: 3})
+            tags = [await group_day_tag(group_id, (today + timedelta(days=n)).isoformat()) for n in (0, 1)]
+            return result, tags
+        finally:
+            await engine.dispose()
+
+    result, tags = asyncio.run(run())
+    assert result["groups"] == 1
+    for tag in tags:
+        assert cache_module.local_cache.get(tag.key) is not None
+        assert tag.key in fake_redis.strings
+    assert "Сети".encode() in fake_redis.strings[tags[0].key]
+
+
+class BrokenRedis:
+    """Redis, до которого нельзя достучаться"""
+
+    def __getattr__(self, name):
+        async def fail(*args, **kwargs):
+            raise ConnectionError("Redis is down")
+        if name == "pipeline":
+            raise ConnectionError("Redis is down")
+        return fail
+
+
+def test_warmup_survives_unavailable_db_and_redis(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(cache_module, "redis_client", BrokenRedis())
+    monkeypatch.setattr(cache_module, "redis_breaker", cache_module.CircuitBreaker(3, 30))
+    monkeypatch.setattr(warmup.settings, "WARMUP_POLL_INTERVAL", 3600)
+    engine = use_database(monkeypatch, f"sqlite:///{tmp_path / 'missing' / 'schedule.db'}")  # каталога нет
+    runs = []
+    original = warmup.warm_up_cache
+
+    async def counting_warm_up(**kwargs):
+        runs.append(1)
+        return await original(**kwargs)
+
+    monkeypatch.setattr(warmup, "warm_up_cache", counting_warm_up)
+
+    async def run():
+        # Как в startup: задача в фоне, ошибки прогрева не всплывают и не держат event loop
+        task = asyncio.create_task(warmup.warmup_loop(lambda: ({1: 1}, {})))
+        try:
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if runs and not task.done():
+                    await asyncio.sleep(0.05)
+                    break
+            assert not task.done(), "warmup_loop завершился с ошибкой"
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await engine.dispose()
+
+    asyncio.run(run())
+    assert runs == [1]
+    assert "Ошибка прогрева кеша" in caplog.text
+    cache_module.local_cache.clear()
+    cache_module.version_cache.clear()
+
+
+def test_warmup_uses_schedule_timezone(monkeypatch):
+    # Сервер в UTC, расписание в UTC+4: в 21:30 UTC у студентов уже следующий день
+    from datetime import timezone
+    from app.services import timeline
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            utc = datetime(2025, 9, 1, 21, 30, tzinfo=timezone.utc)
+            return utc.astimezone(tz) if tz else utc.replace(tzinfo=None)
+
+    monkeypatch.setattr(timeline, "datetime", FakeDatetime)
+    monkeypatch.setattr(warmup.settings, "TIMEZONE", "Asia/Dubai")
+    warmed = []
+
+    async def popular(db, top_n, groups=None, teachers=None):
+        return [1], []
+
+    async def record_day(group_id, day):
+        warmed.append(day)
+
+    async def record_range(group_id, start, end):
+        warmed.append((start.isoformat(), end.isoformat()))
+
+    monkeypatch.setattr(warmup, "get_popular", popular)
+    monkeypatch.setattr(warmup, "cached_group_day", record_day)
+    monkeypatch.setattr(warmup, "cached_group_range", record_range)
+    asyncio.run(warmup.warm_up_cache())
+    assert warmed == ["2025-09-02", "2025-09-03", ("2025-09-01", "2025-09-07")]
+    assert warmup.next_daily_run(warmup.local_now()) == datetime(2025, 9, 2, 2, 0)  # 01:30 по Дубаю - прогрев через 30 минут
@@ -0,0 +1,19 @@
+import argparse
+import asyncio
+
+from app.core.config import settings
+from app.services.warmup import warm_up_cache
+
+
+def main():
+    # Прогрев кеша вручную или из cron/после импорта: python warm_cache.py --top 50
+    parser = argparse.ArgumentParser(description="Прогрев кеша расписаний популярных групп и преподавателей")
+    parser.add_argument("--top", type=int, default=settings.WARMUP_TOP_N, help="Сколько групп и преподавателей прогревать")
+    args = parser.parse_args()
+
+    result = asyncio.run(warm_up_cache(top_n=args.top))
+    print(f"Кеш прогрет: групп {result['groups']}, преподавателей {result['teachers']} за {result['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()